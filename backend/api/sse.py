@@ -0,0 +1,81 @@
+"""Server-Sent Events helpers shared by the streaming endpoints."""
+from __future__ import annotations
+
+import asyncio
+from typing import Any, AsyncIterator, Dict, List
+
+import orjson
+
+
+# Interval for keep-alive comments so proxies don't time out long LLM runs
+SSE_PING_SECONDS = 15
+
+# How long to keep collecting frames before flushing them as one write
+COALESCE_WINDOW_SECONDS = 0.05
+
+_END = object()
+
+
+def frame(payload: bytes) -> bytes:
+    """Wrap an already-serialized JSON payload in an SSE `data:` frame."""
+    return b"data: " + payload + b"\n\n"
+
+
+def encode_event(event: Dict[str, Any]) -> bytes:
+    """Serialize an event dict into a complete SSE `data:` frame.
+
+    EventSourceResponse passes bytes through untouched, so frames built here
+    skip its per-event string formatting.
+    """
+    return frame(orjson.dumps(event))
+
+
+async def coalesce(
+    frames: AsyncIterator[bytes],
+    window: float = COALESCE_WINDOW_SECONDS,
+) -> AsyncIterator[bytes]:
+    """Batch SSE frames that arrive within `window` seconds into one chunk.
+
+    The source generator is drained by a background task into a queue; each
+    flush waits for the first pending frame, then collects whatever else
+    arrives before the window closes and yields it as a single write.
+    """
+    queue: asyncio.Queue = asyncio.Queue()
+
+    async def pump() -> None:
+        try:
+            async for frame in frames:
+                await queue.put(frame)
+        except Exception as e:
+            await queue.put(e)
+        finally:
+            await queue.put(_END)
+
+    task = asyncio.create_task(pump())
+    loop = asyncio.get_running_loop()
+    try:
+        finished = False
+        while not finished:
+            item = await queue.get()
+            batch: List[bytes] = []
+            deadline = loop.time() + window
+            while True:
+                if item is _END:
+                    finished = True
+                    break
+                if isinstance(item, Exception):
+                    if batch:
+                        yield b"".join(batch)
+                    raise item
+                batch.append(item)
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(queue.get(), timeout=remaining)
+                except asyncio.TimeoutError:
+                    break
+            if batch:
+                yield b"".join(batch)
+    finally:
+        task.cancel()
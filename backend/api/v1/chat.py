@@ -1,28 +1,51 @@
 """API endpoints for chat agent and artifacts."""
 from __future__ import annotations
 
+import asyncio
 import json
 import uuid
-import sqlite3
 from datetime import datetime
 from typing import Optional, List, Dict, Any
-from pathlib import Path
-from fastapi import APIRouter, HTTPException, Depends
-from fastapi.responses import StreamingResponse
+import msgspec
+import orjson
+from cachetools import TTLCache
+from fastapi import APIRouter, HTTPException, Depends, Request
+from fastapi.responses import Response
+from sse_starlette.sse import EventSourceResponse
 from pydantic import BaseModel
 
+from api.sse import SSE_PING_SECONDS, coalesce, encode_event, frame
+from db import acquire_read, acquire_write, compress_json, decompress_json, pack_json
 from services.bigquery import BigQueryService
 from services.chat_agent import ChatAgentService
+from services.registry import DEFAULT_KEY, AgentRegistry
 from api.v1.connection import get_bigquery_service
 
 
 router = APIRouter(prefix="/chat", tags=["chat"])
 
-# SQLite database path
-DB_PATH = Path(__file__).parent.parent.parent / "lunara.db"
+# Chat agent instances, one per user
+_chat_agents: AgentRegistry[ChatAgentService] = AgentRegistry()
 
-# Global chat agent instance
-_chat_agent: Optional[ChatAgentService] = None
+# Encoded artifact listing; kept briefly since other workers may also write
+_ARTIFACT_LIST_CACHE: TTLCache = TTLCache(maxsize=1, ttl=5)
+
+# Encoded artifacts by id; rows are never updated in place, only deleted
+_ARTIFACT_CACHE: TTLCache = TTLCache(maxsize=64, ttl=60)
+
+# Bumped on every artifact write; a read only fills the caches if no write
+# happened while it ran, so it cannot re-insert what the write invalidated
+_artifact_generation = 0
+
+# Artifact statements, kept as fixed strings so each connection's
+# statement cache reuses the compiled query
+_SQL_INSERT_ARTIFACT = (
+    "INSERT INTO artifacts (id, title, sql, data, data_blob, created_at) "
+    "VALUES (?, ?, ?, '', ?, ?)"
+)
+_SQL_LIST_ARTIFACTS = "SELECT id, title, sql, created_at FROM artifacts ORDER BY created_at DESC"
+_SQL_GET_ARTIFACT = "SELECT id, title, sql, data_blob, created_at FROM artifacts WHERE id = ?"
+_SQL_DELETE_ARTIFACT = "DELETE FROM artifacts WHERE id = ?"
 
 
 # Request/Response models
@@ -49,35 +72,79 @@ class Artifact(BaseModel):
     created_at: str
 
 
-def get_chat_agent(
+class ArtifactSummary(msgspec.Struct, frozen=True):
+    id: str
+    title: str
+    sql: str
+    created_at: str
+
+
+async def get_chat_agent(
     bq_service: BigQueryService = Depends(get_bigquery_service)
 ) -> ChatAgentService:
     """Get or create the chat agent service."""
-    global _chat_agent
-    if _chat_agent is None:
-        _chat_agent = ChatAgentService(bq_service)
-    return _chat_agent
+    return await _chat_agents.get_or_create(
+        DEFAULT_KEY, lambda: ChatAgentService(bq_service)
+    )
 
 
-def init_artifacts_db():
+async def init_artifacts_db():
     """Initialize the artifacts table if it doesn't exist."""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS artifacts (
-            id TEXT PRIMARY KEY,
-            title TEXT NOT NULL,
-            sql TEXT NOT NULL,
-            data TEXT NOT NULL,
-            created_at TEXT NOT NULL
-        )
-    """)
-    conn.commit()
-    conn.close()
+    async with acquire_write() as conn:
+        await asyncio.to_thread(conn.execute, """
+            CREATE TABLE IF NOT EXISTS artifacts (
+                id TEXT PRIMARY KEY,
+                title TEXT NOT NULL,
+                sql TEXT NOT NULL,
+                data TEXT NOT NULL DEFAULT '',
+                data_blob BLOB,
+                created_at TEXT NOT NULL
+            )
+        """)
+        await asyncio.to_thread(_migrate_artifact_data, conn)
+        await asyncio.to_thread(_create_artifact_indexes, conn)
+
 
+def _create_artifact_indexes(conn) -> None:
+    """Create the covering listing index, analyzing the table when first created.
+    
+    The index holds every column the listing selects, so it is served by an
+    index-only scan in sort order without touching the table rows.
+    """
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'idx_artifacts_listing'"
+    ).fetchone()
+    if exists:
+        return
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_artifacts_listing "
+        "ON artifacts(created_at DESC, id, title, sql)"
+    )
+    # Superseded by the covering index
+    conn.execute("DROP INDEX IF EXISTS idx_artifacts_created")
+    conn.execute("ANALYZE artifacts")
 
-# Initialize DB on module load
-init_artifacts_db()
+
+def _migrate_artifact_data(conn) -> None:
+    """Move legacy JSON text in `data` into the compressed `data_blob` column.
+
+    Safe to run on every startup: only rows without a blob are converted.
+    """
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(artifacts)")}
+    if "data_blob" not in columns:
+        conn.execute("ALTER TABLE artifacts ADD COLUMN data_blob BLOB")
+    
+    rows = conn.execute("SELECT id, data FROM artifacts WHERE data_blob IS NULL").fetchall()
+    for artifact_id, data in rows:
+        try:
+            blob = pack_json(orjson.loads(data) if data else [])
+        except orjson.JSONDecodeError:
+            # Rows written by json.dumps may hold NaN/Infinity, which orjson rejects
+            blob = pack_json(json.loads(data))
+        conn.execute(
+            "UPDATE artifacts SET data_blob = ?, data = '' WHERE id = ?",
+            (blob, artifact_id)
+        )
 
 
 @router.post("/query")
@@ -96,24 +163,17 @@ async def chat_query(
     async def event_stream():
         """Generate SSE events from chat agent."""
         try:
-            async for event in chat_agent.chat(
+            async for payload in chat_agent.chat(
                 message=request.message,
-                semantic_model=request.semantic_model
+                semantic_model=request.semantic_model,
+                as_bytes=True
             ):
-                yield f"data: {json.dumps(event)}\n\n"
+                yield frame(payload)
         except Exception as e:
             error_event = {"type": "error", "content": str(e)}
-            yield f"data: {json.dumps(error_event)}\n\n"
-    
-    return StreamingResponse(
-        event_stream(),
-        media_type="text/event-stream",
-        headers={
-            "Cache-Control": "no-cache",
-            "Connection": "keep-alive",
-            "X-Accel-Buffering": "no"
-        }
-    )
+            yield encode_event(error_event)
+    
+    return EventSourceResponse(coalesce(event_stream()), ping=SSE_PING_SECONDS, sep="\n")
 
 
 @router.post("/execute")
@@ -138,53 +198,136 @@ async def execute_query(
     return result
 
 
-@router.post("/artifacts", response_model=Artifact)
-async def create_artifact(artifact: ArtifactCreate):
+def _parse_artifact_body(raw: bytes) -> tuple:
+    """Parse a create-artifact body and encode its data once (runs in a worker thread).
+    
+    Returns:
+        Tuple of (title, sql, data_json, data_blob).
+    """
+    try:
+        payload = orjson.loads(raw)
+    except orjson.JSONDecodeError:
+        raise HTTPException(status_code=422, detail="Request body is not valid JSON")
+    
+    if not (
+        isinstance(payload, dict)
+        and isinstance(payload.get("title"), str)
+        and isinstance(payload.get("sql"), str)
+        and isinstance(payload.get("data"), list)
+    ):
+        raise HTTPException(
+            status_code=422,
+            detail="Expected an object with string 'title', string 'sql' and list 'data'"
+        )
+    
+    data_json = orjson.dumps(payload["data"])
+    return payload["title"], payload["sql"], data_json, compress_json(data_json)
+
+
+@router.post(
+    "/artifacts",
+    response_model=Artifact,
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {"application/json": {"schema": ArtifactCreate.model_json_schema()}},
+        }
+    },
+)
+async def create_artifact(request: Request) -> Response:
     """
     Save a query result as an artifact.
+    
+    The body is read raw and parsed once with orjson instead of being
+    validated cell by cell into an ArtifactCreate model.
     """
+    raw = await request.body()
+    title, sql, data_json, data_blob = await asyncio.to_thread(_parse_artifact_body, raw)
+    
     artifact_id = str(uuid.uuid4())
     created_at = datetime.utcnow().isoformat()
     
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute(
-        "INSERT INTO artifacts (id, title, sql, data, created_at) VALUES (?, ?, ?, ?, ?)",
-        (artifact_id, artifact.title, artifact.sql, json.dumps(artifact.data), created_at)
-    )
-    conn.commit()
-    conn.close()
-    
-    return Artifact(
-        id=artifact_id,
-        title=artifact.title,
-        sql=artifact.sql,
-        data=artifact.data,
-        created_at=created_at
-    )
+    async with acquire_write() as conn:
+        await asyncio.to_thread(
+            conn.execute,
+            _SQL_INSERT_ARTIFACT,
+            (artifact_id, title, sql, data_blob, created_at)
+        )
+    
+    _invalidate_artifacts()
+    
+    metadata = {"id": artifact_id, "title": title, "sql": sql, "created_at": created_at}
+    return Response(_artifact_json(metadata, data_json), media_type="application/json")
+
+
+def _invalidate_artifacts(artifact_id: Optional[str] = None) -> None:
+    """Drop cached artifact reads after a write and start a new generation."""
+    global _artifact_generation
+    _artifact_generation += 1
+    _ARTIFACT_LIST_CACHE.clear()
+    if artifact_id is not None:
+        _ARTIFACT_CACHE.pop(artifact_id, None)
+
+
+def _artifact_json(metadata: Dict[str, Any], data_json: bytes) -> bytes:
+    """Build an artifact JSON object around an already-encoded data array."""
+    return orjson.dumps(metadata)[:-1] + b',"data":' + data_json + b"}"
 
 
-@router.get("/artifacts", response_model=List[Artifact])
-async def list_artifacts():
+def _fetch_artifact_summaries(conn) -> List[ArtifactSummary]:
+    """Read artifact metadata without the data payload (runs in a worker thread)."""
+    # Iterate the cursor directly: rows become structs without an
+    # intermediate fetchall() list (column order matches the struct fields)
+    return [ArtifactSummary(*row) for row in conn.execute(_SQL_LIST_ARTIFACTS)]
+
+
+def _fetch_artifact(conn, artifact_id: str) -> Optional[bytes]:
+    """Read a single artifact as response JSON (runs in a worker thread).
+    
+    The stored data is already JSON, so it is decompressed and spliced into
+    the response without being parsed into Python objects.
     """
-    Get all saved artifacts.
+    row = conn.execute(_SQL_GET_ARTIFACT, (artifact_id,)).fetchone()
+    if row is None:
+        return None
+    metadata = {"id": row[0], "title": row[1], "sql": row[2], "created_at": row[4]}
+    return _artifact_json(metadata, decompress_json(row[3]))
+
+
+@router.get("/artifacts")
+async def list_artifacts() -> Response:
+    """
+    Get all saved artifacts without their result data.
     """
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute("SELECT id, title, sql, data, created_at FROM artifacts ORDER BY created_at DESC")
-    rows = cursor.fetchall()
-    conn.close()
+    body = _ARTIFACT_LIST_CACHE.get(None)
+    if body is None:
+        generation = _artifact_generation
+        async with acquire_read() as conn:
+            summaries = await asyncio.to_thread(_fetch_artifact_summaries, conn)
+        body = msgspec.json.encode(summaries)
+        if generation == _artifact_generation:
+            _ARTIFACT_LIST_CACHE[None] = body
     
-    return [
-        Artifact(
-            id=row[0],
-            title=row[1],
-            sql=row[2],
-            data=json.loads(row[3]),
-            created_at=row[4]
-        )
-        for row in rows
-    ]
+    return Response(body, media_type="application/json")
+
+
+@router.get("/artifacts/{artifact_id}", response_model=Artifact)
+async def get_artifact(artifact_id: str) -> Response:
+    """
+    Get a single artifact including its result data.
+    """
+    body = _ARTIFACT_CACHE.get(artifact_id)
+    if body is None:
+        generation = _artifact_generation
+        async with acquire_read() as conn:
+            body = await asyncio.to_thread(_fetch_artifact, conn, artifact_id)
+        
+        if body is None:
+            raise HTTPException(status_code=404, detail="Artifact not found")
+        if generation == _artifact_generation:
+            _ARTIFACT_CACHE[artifact_id] = body
+    
+    return Response(body, media_type="application/json")
 
 
 @router.delete("/artifacts/{artifact_id}")
@@ -192,13 +335,14 @@ async def delete_artifact(artifact_id: str):
     """
     Delete an artifact by ID.
     """
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute("DELETE FROM artifacts WHERE id = ?", (artifact_id,))
-    if cursor.rowcount == 0:
-        conn.close()
+    async with acquire_write() as conn:
+        cursor = await asyncio.to_thread(
+            conn.execute, _SQL_DELETE_ARTIFACT, (artifact_id,)
+        )
+        deleted = cursor.rowcount
+    
+    _invalidate_artifacts(artifact_id)
+    if deleted == 0:
         raise HTTPException(status_code=404, detail="Artifact not found")
-    conn.commit()
-    conn.close()
     
     return {"status": "deleted", "id": artifact_id}
@@ -1,5 +1,10 @@
 """API endpoints for BigQuery connection management."""
-from fastapi import APIRouter, HTTPException, Depends
+from typing import Callable, Coroutine, Any
+
+from fastapi import APIRouter, HTTPException, Depends, Request, Response
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import ORJSONResponse
+from fastapi.routing import APIRoute
 
 from models.connection import (
     ConnectionRequest,
@@ -10,7 +15,40 @@ from models.connection import (
 from services.bigquery import BigQueryService
 
 
-router = APIRouter(prefix="/connection", tags=["connection"])
+def _validation_message(exc: RequestValidationError) -> str:
+    """Describe a rejected connection request the way the frontend shows errors."""
+    errors = exc.errors()
+    missing = sorted({str(err["loc"][-1]) for err in errors if err["type"] == "missing"})
+    if missing:
+        return f"Missing required field: {', '.join(missing)}"
+    err = errors[0]
+    field = ".".join(str(part) for part in err["loc"][1:]) or "request"
+    return f"Invalid {field}: {err['msg']}"
+
+
+class ConnectionRoute(APIRoute):
+    """Route that reports invalid request bodies as a ConnectionResponse.
+    
+    The frontend reads `status` and `message` rather than FastAPI's 422 `detail`.
+    """
+    
+    def get_route_handler(self) -> Callable[[Request], Coroutine[Any, Any, Response]]:
+        handler = super().get_route_handler()
+        
+        async def route_handler(request: Request) -> Response:
+            try:
+                return await handler(request)
+            except RequestValidationError as exc:
+                response = ConnectionResponse(
+                    status=ConnectionStatus.ERROR,
+                    message=_validation_message(exc)
+                )
+                return ORJSONResponse(response.model_dump(mode="json"))
+        
+        return route_handler
+
+
+router = APIRouter(prefix="/connection", tags=["connection"], route_class=ConnectionRoute)
 
 
 def get_bigquery_service() -> BigQueryService:
@@ -35,7 +73,10 @@ async def connect_bigquery(
     Returns:
         ConnectionResponse with status and connection details.
     """
+    from api.v1 import datasets
+    
     status, message, datasets_count = bq_service.validate_and_connect(request.credentials)
+    datasets.clear_cache()
     
     return ConnectionResponse(
         status=status,
@@ -78,5 +119,8 @@ async def disconnect(
     Returns:
         Success message.
     """
+    from api.v1 import datasets
+    
     bq_service.disconnect()
+    datasets.clear_cache()
     return {"message": "Disconnected successfully"}
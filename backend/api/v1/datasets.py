@@ -1,6 +1,12 @@
 """API endpoints for dataset and table browsing."""
-from typing import Optional
+import asyncio
+from collections import defaultdict
+from functools import partial
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+import msgspec
+from cachetools import TTLCache
 from fastapi import APIRouter, HTTPException, Depends
+from fastapi.responses import Response
 
 from models.datasets import (
     DatasetInfo,
@@ -14,38 +20,118 @@ from api.v1.connection import get_bigquery_service
 
 router = APIRouter(prefix="/datasets", tags=["datasets"])
 
+# Listing caches keyed by project (and dataset); metadata changes rarely
+_DATASETS_CACHE: TTLCache = TTLCache(maxsize=128, ttl=60)
+_TABLES_CACHE: TTLCache = TTLCache(maxsize=128, ttl=60)
 
-@router.get("", response_model=DatasetsResponse)
+# Per-key locks so concurrent misses trigger a single BigQuery fetch
+_cache_locks: Dict[Hashable, asyncio.Lock] = defaultdict(asyncio.Lock)
+
+
+def clear_cache() -> None:
+    """Drop cached listings (called when the connection changes)."""
+    _DATASETS_CACHE.clear()
+    _TABLES_CACHE.clear()
+
+
+async def _get_cached(
+    cache: TTLCache,
+    key: Hashable,
+    fetch: Callable[[], Awaitable[Any]],
+) -> Any:
+    """Return a cached value, fetching it under a per-key lock on a miss."""
+    value = cache.get(key)
+    if value is not None:
+        return value
+    
+    async with _cache_locks[key]:
+        value = cache.get(key)
+        if value is None:
+            value = await fetch()
+            cache[key] = value
+        return value
+
+
+async def _in_executor(func: Callable[..., Any], *args: Any) -> Any:
+    """Run a blocking BigQuery client call on the default thread pool."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, partial(func, *args))
+
+
+def _count_tables(client, dataset_id: str) -> int:
+    """Count tables in a dataset without materializing the listing."""
+    return sum(1 for _ in client.list_tables(dataset_id))
+
+
+def _struct_schema(struct_type: type) -> Dict[str, Any]:
+    """Self-contained JSON schema of a msgspec Struct for the OpenAPI docs."""
+    (schema,), components = msgspec.json.schema_components([struct_type], ref_template="{name}")
+    
+    def inline(node: Any) -> Any:
+        if isinstance(node, dict):
+            if "$ref" in node:
+                return inline(components[node["$ref"]])
+            return {key: inline(value) for key, value in node.items()}
+        if isinstance(node, list):
+            return [inline(value) for value in node]
+        return node
+    
+    return inline(schema)
+
+
+@router.get(
+    "",
+    responses={
+        200: {"content": {"application/json": {"schema": _struct_schema(DatasetsResponse)}}}
+    },
+)
 async def list_datasets(
     bq_service: BigQueryService = Depends(get_bigquery_service)
-) -> DatasetsResponse:
+) -> Response:
     """List all datasets in the connected BigQuery project.
     
     Args:
         bq_service: Injected BigQuery service.
         
     Returns:
-        DatasetsResponse with list of datasets.
+        JSON-encoded DatasetsResponse with list of datasets.
     """
     if bq_service.client is None:
         raise HTTPException(status_code=400, detail="Not connected to BigQuery")
     
+    response = await _get_cached(
+        _DATASETS_CACHE,
+        bq_service.project_id,
+        lambda: _fetch_datasets(bq_service),
+    )
+    return Response(msgspec.json.encode(response), media_type="application/json")
+
+
+async def _fetch_datasets(bq_service: BigQueryService) -> DatasetsResponse:
+    """Fetch dataset metadata and table counts from BigQuery."""
+    client = bq_service.client
     try:
-        datasets = []
-        for dataset in bq_service.client.list_datasets():
-            dataset_ref = bq_service.client.get_dataset(dataset.dataset_id)
-            
-            # Count tables in dataset
-            tables = list(bq_service.client.list_tables(dataset.dataset_id))
-            table_count = len(tables)
-            
-            datasets.append(DatasetInfo(
+        dataset_items = await _in_executor(lambda: list(client.list_datasets()))
+        
+        # Fetch dataset metadata and table counts for all datasets concurrently
+        details = await asyncio.gather(*(
+            asyncio.gather(
+                _in_executor(client.get_dataset, dataset.dataset_id),
+                _in_executor(_count_tables, client, dataset.dataset_id),
+            )
+            for dataset in dataset_items
+        ))
+        
+        datasets = [
+            DatasetInfo(
                 dataset_id=dataset.dataset_id,
                 location=dataset_ref.location,
                 description=dataset_ref.description,
                 created=dataset_ref.created.isoformat() if dataset_ref.created else None,
                 table_count=table_count,
-            ))
+            )
+            for dataset, (dataset_ref, table_count) in zip(dataset_items, details)
+        ]
         
         return DatasetsResponse(
             project_id=bq_service.project_id,
@@ -73,13 +159,27 @@ async def list_tables(
     if bq_service.client is None:
         raise HTTPException(status_code=400, detail="Not connected to BigQuery")
     
+    return await _get_cached(
+        _TABLES_CACHE,
+        (bq_service.project_id, dataset_id),
+        lambda: _fetch_tables(bq_service, dataset_id),
+    )
+
+
+async def _fetch_tables(bq_service: BigQueryService, dataset_id: str) -> TablesResponse:
+    """Fetch table metadata for a dataset from BigQuery."""
+    client = bq_service.client
     try:
-        tables = []
-        for table in bq_service.client.list_tables(dataset_id):
-            # Get full table metadata
-            table_ref = bq_service.client.get_table(f"{dataset_id}.{table.table_id}")
-            
-            tables.append(TableInfo(
+        table_items = await _in_executor(lambda: list(client.list_tables(dataset_id)))
+        
+        # Get full table metadata for all tables concurrently
+        table_refs = await asyncio.gather(*(
+            _in_executor(client.get_table, f"{dataset_id}.{table.table_id}")
+            for table in table_items
+        ))
+        
+        tables = [
+            TableInfo(
                 table_id=table.table_id,
                 dataset_id=dataset_id,
                 table_type=table_ref.table_type,
@@ -87,7 +187,9 @@ async def list_tables(
                 size_bytes=table_ref.num_bytes,
                 last_modified=table_ref.modified.isoformat() if table_ref.modified else None,
                 description=table_ref.description,
-            ))
+            )
+            for table, table_ref in zip(table_items, table_refs)
+        ]
         
         return TablesResponse(
             project_id=bq_service.project_id,
@@ -1,41 +1,52 @@
 """API endpoints for semantic layer generation."""
 from __future__ import annotations
 
-import json
-from typing import Optional, List
+from typing import List
 from fastapi import APIRouter, HTTPException, Depends
-from fastapi.responses import StreamingResponse
+from sse_starlette.sse import EventSourceResponse
 
+from api.sse import SSE_PING_SECONDS, coalesce, encode_event, frame
 from models.semantic import GenerateRequest, SemanticModel, StreamEvent, RelationshipRequest
 from services.bigquery import BigQueryService
 from services.semantic_agent import SemanticAgentService
 from services.relationship_agent import RelationshipAgentService
+from services.registry import DEFAULT_KEY, AgentRegistry
 from api.v1.connection import get_bigquery_service
 
 
 router = APIRouter(prefix="/semantic", tags=["semantic"])
 
-# Global semantic agent instance (initialized on first use)
-_semantic_agent: Optional[SemanticAgentService] = None
-_relationship_agent: Optional[RelationshipAgentService] = None
-
-
-def get_semantic_agent(
+# Agent instances (initialized on first use), one per user
+_semantic_agents: AgentRegistry[SemanticAgentService] = AgentRegistry()
+_relationship_agents: AgentRegistry[RelationshipAgentService] = AgentRegistry()
+
+# Fixed progress frames, encoded once at import
+_PHASE1_FRAME = encode_event(
+    {"type": "phase", "content": "🚀 Phase 1: Analyzing tables and classifying columns..."}
+)
+_PHASE2_FRAME = encode_event(
+    {"type": "phase", "content": "🔗 Phase 2: Detecting relationships between tables..."}
+)
+_SKIP_FRAME = encode_event(
+    {"type": "status", "content": "⚠️ Skipping relationship detection - no table data available"}
+)
+_COMPLETE_FRAME = encode_event(
+    {"type": "complete", "content": "✅ Semantic layer generation complete!"}
+)
+
+
+async def get_semantic_agent(
     bq_service: BigQueryService = Depends(get_bigquery_service)
 ) -> SemanticAgentService:
     """Get or create the semantic agent service."""
-    global _semantic_agent
-    if _semantic_agent is None:
-        _semantic_agent = SemanticAgentService(bq_service)
-    return _semantic_agent
+    return await _semantic_agents.get_or_create(
+        DEFAULT_KEY, lambda: SemanticAgentService(bq_service)
+    )
 
 
-def get_relationship_agent() -> RelationshipAgentService:
+async def get_relationship_agent() -> RelationshipAgentService:
     """Get or create the relationship agent service."""
-    global _relationship_agent
-    if _relationship_agent is None:
-        _relationship_agent = RelationshipAgentService()
-    return _relationship_agent
+    return await _relationship_agents.get_or_create(DEFAULT_KEY, RelationshipAgentService)
 
 
 @router.post("/generate")
@@ -59,7 +70,7 @@ async def generate_semantic_layer(
         relationship_agent: Injected relationship agent service
         
     Returns:
-        StreamingResponse with SSE events
+        EventSourceResponse with SSE events
     """
     if not request.tables:
         raise HTTPException(status_code=400, detail="No tables provided")
@@ -70,8 +81,7 @@ async def generate_semantic_layer(
         
         try:
             # Phase 1: Semantic Layer Generation
-            phase_event = {"type": "phase", "content": "🚀 Phase 1: Analyzing tables and classifying columns..."}
-            yield f"data: {json.dumps(phase_event)}\n\n"
+            yield _PHASE1_FRAME
             
             async for event in semantic_agent.generate_semantic_layer(request.tables):
                 # Capture the model data for the relationship agent
@@ -79,36 +89,27 @@ async def generate_semantic_layer(
                     semantic_model = event.get("data", {})
                 
                 # Forward all events to the stream
-                yield f"data: {json.dumps(event)}\n\n"
+                yield encode_event(event)
             
             # Phase 2: Relationship Detection (only if we have model data)
             if semantic_model and semantic_model.get("tables"):
-                phase_event = {"type": "phase", "content": "🔗 Phase 2: Detecting relationships between tables..."}
-                yield f"data: {json.dumps(phase_event)}\n\n"
+                yield _PHASE2_FRAME
                 
-                async for event in relationship_agent.detect_relationships(semantic_model):
-                    yield f"data: {json.dumps(event)}\n\n"
+                async for payload in relationship_agent.detect_relationships(
+                    semantic_model, as_bytes=True
+                ):
+                    yield frame(payload)
             else:
-                skip_event = {"type": "status", "content": "⚠️ Skipping relationship detection - no table data available"}
-                yield f"data: {json.dumps(skip_event)}\n\n"
+                yield _SKIP_FRAME
             
             # Final completion
-            complete_event = {"type": "complete", "content": "✅ Semantic layer generation complete!"}
-            yield f"data: {json.dumps(complete_event)}\n\n"
+            yield _COMPLETE_FRAME
             
         except Exception as e:
             error_event = {"type": "error", "content": str(e)}
-            yield f"data: {json.dumps(error_event)}\n\n"
+            yield encode_event(error_event)
     
-    return StreamingResponse(
-        event_stream(),
-        media_type="text/event-stream",
-        headers={
-            "Cache-Control": "no-cache",
-            "Connection": "keep-alive",
-            "X-Accel-Buffering": "no",
-        }
-    )
+    return EventSourceResponse(coalesce(event_stream()), ping=SSE_PING_SECONDS, sep="\n")
 
 
 @router.get("/models")
@@ -168,7 +169,7 @@ async def detect_relationships(
         agent: Injected relationship agent service
         
     Returns:
-        StreamingResponse with SSE events containing analysis and detected relationships
+        EventSourceResponse with SSE events containing analysis and detected relationships
     """
     if not request.tables:
         raise HTTPException(status_code=400, detail="No tables provided")
@@ -177,20 +178,11 @@ async def detect_relationships(
         """Generate SSE events from relationship agent stream."""
         try:
             semantic_model = {"tables": request.tables}
-            async for event in agent.detect_relationships(semantic_model):
-                data = json.dumps(event)
-                yield f"data: {data}\n\n"
+            async for payload in agent.detect_relationships(semantic_model, as_bytes=True):
+                yield frame(payload)
         except Exception as e:
             error_event = {"type": "error", "content": str(e)}
-            yield f"data: {json.dumps(error_event)}\n\n"
+            yield encode_event(error_event)
     
-    return StreamingResponse(
-        event_stream(),
-        media_type="text/event-stream",
-        headers={
-            "Cache-Control": "no-cache",
-            "Connection": "keep-alive",
-            "X-Accel-Buffering": "no",
-        }
-    )
+    return EventSourceResponse(coalesce(event_stream()), ping=SSE_PING_SECONDS, sep="\n")
 
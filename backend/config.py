@@ -0,0 +1,28 @@
+"""Application settings read once from the environment."""
+from __future__ import annotations
+
+import os
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Optional
+
+from dotenv import load_dotenv
+
+
+@dataclass(frozen=True, slots=True)
+class Settings:
+    """Environment-derived configuration for the backend."""
+    encryption_key: Optional[str]
+
+
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """Load `.env` and read settings once per process.
+    
+    Returns:
+        The cached Settings instance.
+    """
+    load_dotenv()
+    return Settings(
+        encryption_key=os.getenv("ENCRYPTION_KEY"),
+    )
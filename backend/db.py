@@ -0,0 +1,144 @@
+"""Shared SQLite connections for the Lunara backend.
+
+Connections are opened once per process and reused across requests: a single
+writer connection plus a small pool of read-only reader connections, all
+configured with the same pragma block.
+"""
+from __future__ import annotations
+
+import asyncio
+import atexit
+import sqlite3
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Any, AsyncIterator, List, Optional
+
+import orjson
+import zstandard
+
+
+# SQLite database path
+DB_PATH = Path(__file__).parent / "lunara.db"
+
+# Number of reader connections kept open alongside the writer
+READ_POOL_SIZE = 4
+
+# Prepared statements kept per connection (sqlite3 default is 128)
+STATEMENT_CACHE_SIZE = 256
+
+# zstd level for JSON payloads stored as BLOBs
+COMPRESSION_LEVEL = 3
+
+_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-64000",
+    "PRAGMA mmap_size=268435456",
+    "PRAGMA busy_timeout=5000",
+    "PRAGMA foreign_keys=ON",
+)
+
+WRITE_CONN: Optional[sqlite3.Connection] = None
+READ_POOL: List[sqlite3.Connection] = []
+
+_read_lock = asyncio.Lock()
+_read_available = asyncio.Semaphore(READ_POOL_SIZE)
+_write_lock = asyncio.Lock()
+
+
+def _connect(readonly: bool = False) -> sqlite3.Connection:
+    """Open a connection and apply the pragma block.
+    
+    Read-only connections are opened through a `mode=ro` URI, so SQLite never
+    takes write locks on them; they rely on the writer having created the
+    database and switched it to WAL first.
+    """
+    conn = sqlite3.connect(
+        DB_PATH.as_uri() + "?mode=ro" if readonly else DB_PATH,
+        check_same_thread=False,
+        isolation_level=None,
+        cached_statements=STATEMENT_CACHE_SIZE,
+        uri=readonly,
+    )
+    for pragma in _PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+
+def init_db() -> None:
+    """Open the writer and reader connections (idempotent)."""
+    global WRITE_CONN
+    if WRITE_CONN is not None:
+        return
+
+    # The writer goes first: it creates the file and enables WAL
+    WRITE_CONN = _connect()
+    READ_POOL.extend(_connect(readonly=True) for _ in range(READ_POOL_SIZE))
+    atexit.register(close_db)
+
+
+def close_db() -> None:
+    """Optimize and close all open connections."""
+    global WRITE_CONN
+    if WRITE_CONN is None:
+        return
+
+    try:
+        WRITE_CONN.execute("PRAGMA optimize")
+    except sqlite3.Error:
+        pass
+    for conn in READ_POOL:
+        conn.close()
+    READ_POOL.clear()
+    WRITE_CONN.close()
+    WRITE_CONN = None
+
+
+@asynccontextmanager
+async def acquire_read() -> AsyncIterator[sqlite3.Connection]:
+    """Check out a reader connection from the pool."""
+    init_db()
+    async with _read_available:
+        async with _read_lock:
+            conn = READ_POOL.pop()
+        try:
+            yield conn
+        finally:
+            async with _read_lock:
+                READ_POOL.append(conn)
+
+
+@asynccontextmanager
+async def acquire_write() -> AsyncIterator[sqlite3.Connection]:
+    """Run a write transaction on the shared writer connection.
+
+    The transaction is opened with BEGIN IMMEDIATE so the write lock is taken
+    up front instead of failing with SQLITE_BUSY on upgrade. Transaction
+    control runs in a worker thread since it may wait on busy_timeout.
+    """
+    init_db()
+    async with _write_lock:
+        await asyncio.to_thread(WRITE_CONN.execute, "BEGIN IMMEDIATE")
+        try:
+            yield WRITE_CONN
+        except BaseException:
+            await asyncio.to_thread(WRITE_CONN.execute, "ROLLBACK")
+            raise
+        else:
+            await asyncio.to_thread(WRITE_CONN.execute, "COMMIT")
+
+
+def compress_json(payload: bytes) -> bytes:
+    """Compress already-serialized JSON for storage in a BLOB column."""
+    return zstandard.ZstdCompressor(level=COMPRESSION_LEVEL).compress(payload)
+
+
+def pack_json(value: Any) -> bytes:
+    """Serialize a value to compressed JSON for storage in a BLOB column."""
+    return compress_json(orjson.dumps(value))
+
+
+def decompress_json(blob: bytes) -> bytes:
+    """Return the serialized JSON stored by compress_json()/pack_json()."""
+    return zstandard.ZstdDecompressor().decompress(blob)
@@ -1,84 +1,186 @@
 """Lunara Backend - FastAPI Application."""
 from __future__ import annotations
 
+import asyncio
+import logging
 import os
-from contextlib import asynccontextmanager
+import queue
+import shutil
+from contextlib import asynccontextmanager, suppress
+from functools import lru_cache
+from logging.handlers import QueueHandler, QueueListener
 from pathlib import Path
-from typing import Optional
+from typing import FrozenSet, Optional, Tuple
 
-from cryptography.fernet import Fernet
-from dotenv import load_dotenv
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 
 from api.v1 import connection
 from api.v1 import datasets
 from api.v1 import semantic
 from api.v1 import chat
+from config import get_settings
+from db import init_db, close_db
 from services.bigquery import BigQueryService
 
 
-# Load environment variables
-load_dotenv()
-
+logger = logging.getLogger("lunara")
 
 # Global BigQuery service instance
 _bq_service: Optional[BigQueryService] = None
 
+# Allowed CORS origins, frozen once at import time
+CORS_ORIGINS: FrozenSet[str] = frozenset({
+    "http://localhost:3000",
+    "http://localhost:5500",
+    "http://127.0.0.1:3000",
+    "http://127.0.0.1:5500",
+    "null",  # For file:// URLs
+})
+
+
+class SetCORSMiddleware(CORSMiddleware):
+    """CORSMiddleware with O(1) origin lookups.
+    
+    Starlette keeps allow_origins as the sequence it was given and checks
+    `origin in self.allow_origins` on every request; storing a frozenset
+    turns that scan into a hash lookup.
+    """
+    
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.allow_origins = frozenset(self.allow_origins)
+
 
+def _update_env_file(path: Path, key: str, value: str) -> None:
+    """Set `key=value` in an env file.
+    
+    A missing key is appended in place; an existing one is rewritten through
+    a temporary file and os.replace so a crash never leaves a truncated file;
+    the file keeps its permissions.
+    
+    Args:
+        path: Path to the env file.
+        key: Variable name.
+        value: Value to store.
+    """
+    entry = f"{key}={value}".encode()
+    try:
+        content = path.read_bytes()
+    except FileNotFoundError:
+        path.write_bytes(entry + b"\n")
+        return
+    
+    prefix = f"{key}=".encode()
+    if content.startswith(prefix):
+        start = 0
+    else:
+        start = content.find(b"\n" + prefix)
+        if start != -1:
+            start += 1
+    
+    if start == -1:
+        with path.open("ab") as f:
+            f.write(b"\n" + entry + b"\n")
+        return
+    
+    end = content.find(b"\n", start)
+    if end == -1:
+        end = len(content)
+    tmp_path = path.with_name(path.name + ".tmp")
+    # Created private, then given the env file's own permissions; the new
+    # content is on disk before the rename makes it visible
+    with os.fdopen(os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), "wb") as f:
+        shutil.copymode(path, tmp_path)
+        f.write(content[:start] + entry + content[end:])
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+@lru_cache(maxsize=1)
 def get_or_create_encryption_key() -> str:
     """Get encryption key from environment or generate a new one.
     
     Returns:
         The encryption key string.
     """
-    key = os.getenv("ENCRYPTION_KEY")
-    
-    if not key or key == "your-fernet-key-here":
-        # Generate a new key and save it
-        key = Fernet.generate_key().decode()
-        env_path = Path(__file__).parent / ".env"
-        
-        # Write or update the .env file
-        if env_path.exists():
-            content = env_path.read_text()
-            if "ENCRYPTION_KEY=" in content:
-                lines = content.split("\n")
-                lines = [
-                    f"ENCRYPTION_KEY={key}" if line.startswith("ENCRYPTION_KEY=") else line
-                    for line in lines
-                ]
-                env_path.write_text("\n".join(lines))
-            else:
-                with open(env_path, "a") as f:
-                    f.write(f"\nENCRYPTION_KEY={key}\n")
-        else:
-            env_path.write_text(f"ENCRYPTION_KEY={key}\n")
-        
-        print(f"Generated new encryption key and saved to .env")
+    key = get_settings().encryption_key
+    if key and key != "your-fernet-key-here":
+        # Configured key: no filesystem access needed
+        return key
+    
+    # Generate a new key and save it
+    from cryptography.fernet import Fernet
+    
+    key = Fernet.generate_key().decode()
+    _update_env_file(Path(__file__).parent / ".env", "ENCRYPTION_KEY", key)
     
+    logger.info("Generated new encryption key and saved to .env")
     return key
 
 
+def _start_logging() -> Tuple[QueueHandler, QueueListener]:
+    """Send log records through a queue drained by a background thread.
+    
+    Callers only enqueue records; the listener thread does the stream
+    writes, so request handlers never block on stdout.
+    """
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(logging.Formatter("%(levelname)s %(name)s: %(message)s"))
+    queue_handler = QueueHandler(log_queue)
+    listener = QueueListener(log_queue, stream_handler)
+    
+    logging.getLogger().addHandler(queue_handler)
+    for name in ("lunara", "services"):
+        logging.getLogger(name).setLevel(logging.INFO)
+    listener.start()
+    return queue_handler, listener
+
+
+async def _liveness_loop(service: BigQueryService) -> None:
+    """Probe the BigQuery connection every PROBE_INTERVAL seconds."""
+    while True:
+        await asyncio.to_thread(service.probe)
+        await asyncio.sleep(service.PROBE_INTERVAL)
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Application lifespan handler for startup/shutdown."""
     global _bq_service
     
     # Startup
+    queue_handler, log_listener = _start_logging()
     encryption_key = get_or_create_encryption_key()
     _bq_service = BigQueryService(encryption_key)
     
     # Override the dependency using FastAPI's proper mechanism
     app.dependency_overrides[connection.get_bigquery_service] = lambda: _bq_service
     
-    print("🚀 Lunara backend started")
+    # Open shared SQLite connections once and make sure tables exist
+    init_db()
+    await chat.init_artifacts_db()
+    
+    liveness_task = asyncio.create_task(_liveness_loop(_bq_service))
+    
+    logger.info("🚀 Lunara backend started")
     
-    yield
+    try:
+        yield
+    finally:
+        liveness_task.cancel()
+        with suppress(asyncio.CancelledError):
+            await liveness_task
     
     # Shutdown
     app.dependency_overrides.clear()
-    print("👋 Lunara backend shutting down")
+    close_db()
+    logger.info("👋 Lunara backend shutting down")
+    logging.getLogger().removeHandler(queue_handler)
+    log_listener.stop()
 
 
 # Create FastAPI application
@@ -87,19 +189,14 @@ app = FastAPI(
     description="Backend API for Lunara - AI-Powered Business Intelligence",
     version="0.1.0",
     lifespan=lifespan,
+    default_response_class=ORJSONResponse,
 )
 
 
 # Configure CORS
 app.add_middleware(
-    CORSMiddleware,
-    allow_origins=[
-        "http://localhost:3000",
-        "http://localhost:5500",
-        "http://127.0.0.1:3000",
-        "http://127.0.0.1:5500",
-        "null",  # For file:// URLs
-    ],
+    SetCORSMiddleware,
+    allow_origins=CORS_ORIGINS,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
@@ -0,0 +1,7 @@
+"""Shared Pydantic base model."""
+from pydantic import BaseModel, ConfigDict
+
+
+class FrozenModel(BaseModel):
+    """Immutable Pydantic v2 model used for request and response schemas."""
+    model_config = ConfigDict(frozen=True, from_attributes=True, populate_by_name=True)
@@ -1,8 +1,10 @@
 """Pydantic models for BigQuery connection."""
-from pydantic import BaseModel, Field
+from pydantic import Field
 from typing import Optional
 from enum import Enum
 
+from models.base import FrozenModel
+
 
 class ConnectionStatus(str, Enum):
     """Status of the BigQuery connection."""
@@ -12,30 +14,31 @@ class ConnectionStatus(str, Enum):
     VALIDATING = "validating"
 
 
-class BigQueryCredentials(BaseModel):
+class BigQueryCredentials(FrozenModel):
     """Service account credentials for BigQuery.
     
-    This model accepts the full service account JSON structure.
+    This model accepts the full service account JSON structure; only the
+    fields needed to authenticate are required.
     """
     type: str = Field(..., description="Should be 'service_account'")
     project_id: str = Field(..., description="Google Cloud project ID")
-    private_key_id: str = Field(..., description="Private key ID")
+    private_key_id: Optional[str] = Field(default=None, description="Private key ID")
     private_key: str = Field(..., description="Private key in PEM format")
     client_email: str = Field(..., description="Service account email")
-    client_id: str = Field(..., description="Client ID")
+    client_id: Optional[str] = Field(default=None, description="Client ID")
     auth_uri: str = Field(default="https://accounts.google.com/o/oauth2/auth")
     token_uri: str = Field(default="https://oauth2.googleapis.com/token")
     auth_provider_x509_cert_url: str = Field(default="https://www.googleapis.com/oauth2/v1/certs")
-    client_x509_cert_url: str = Field(..., description="Client certificate URL")
+    client_x509_cert_url: Optional[str] = Field(default=None, description="Client certificate URL")
     universe_domain: Optional[str] = Field(default="googleapis.com")
 
 
-class ConnectionRequest(BaseModel):
+class ConnectionRequest(FrozenModel):
     """Request body for creating a BigQuery connection."""
-    credentials: dict = Field(..., description="The raw service account JSON object")
+    credentials: BigQueryCredentials = Field(..., description="The service account JSON object")
 
 
-class ConnectionResponse(BaseModel):
+class ConnectionResponse(FrozenModel):
     """Response after attempting to connect to BigQuery."""
     status: ConnectionStatus
     message: str
@@ -43,7 +46,7 @@ class ConnectionResponse(BaseModel):
     datasets_count: Optional[int] = None
 
 
-class ConnectionStatusResponse(BaseModel):
+class ConnectionStatusResponse(FrozenModel):
     """Response for checking current connection status."""
     status: ConnectionStatus
     project_id: Optional[str] = None
@@ -1,19 +1,28 @@
-"""Pydantic models for datasets and tables."""
-from pydantic import BaseModel, Field
-from typing import Optional, List
+"""Models for datasets and tables.
+
+Hot list responses are msgspec Structs encoded directly to JSON; the rest are
+Pydantic models.
+"""
+import msgspec
+from pydantic import Field
+from typing import Annotated, Optional, List
 from datetime import datetime
 
+from models.base import FrozenModel
 
-class DatasetInfo(BaseModel):
+
+class DatasetInfo(msgspec.Struct, frozen=True):
     """Information about a BigQuery dataset."""
-    dataset_id: str = Field(..., description="Dataset identifier")
-    location: Optional[str] = Field(None, description="Geographic location")
-    description: Optional[str] = Field(None, description="Dataset description")
-    created: Optional[str] = Field(None, description="Creation timestamp")
-    table_count: Optional[int] = Field(None, description="Number of tables in dataset")
+    dataset_id: Annotated[str, msgspec.Meta(description="Dataset identifier")]
+    location: Annotated[Optional[str], msgspec.Meta(description="Geographic location")] = None
+    description: Annotated[Optional[str], msgspec.Meta(description="Dataset description")] = None
+    created: Annotated[Optional[str], msgspec.Meta(description="Creation timestamp")] = None
+    table_count: Annotated[
+        Optional[int], msgspec.Meta(description="Number of tables in dataset")
+    ] = None
 
 
-class TableInfo(BaseModel):
+class TableInfo(FrozenModel):
     """Information about a BigQuery table."""
     table_id: str = Field(..., description="Table identifier")
     dataset_id: str = Field(..., description="Parent dataset ID")
@@ -24,14 +33,14 @@ class TableInfo(BaseModel):
     description: Optional[str] = Field(None, description="Table description")
 
 
-class DatasetsResponse(BaseModel):
+class DatasetsResponse(msgspec.Struct, frozen=True):
     """Response for listing datasets."""
     project_id: str
     datasets: List[DatasetInfo]
     count: int
 
 
-class TablesResponse(BaseModel):
+class TablesResponse(FrozenModel):
     """Response for listing tables in a dataset."""
     project_id: str
     dataset_id: str
@@ -39,6 +48,6 @@ class TablesResponse(BaseModel):
     count: int
 
 
-class SelectedTablesRequest(BaseModel):
+class SelectedTablesRequest(FrozenModel):
     """Request for storing selected tables."""
     tables: List[str] = Field(..., description="List of fully qualified table names (dataset.table)")
@@ -1,8 +1,10 @@
 """Pydantic models for semantic layer generation."""
-from pydantic import BaseModel, Field
+from pydantic import Field
 from typing import Optional, List, Dict, Any
 from enum import Enum
 
+from models.base import FrozenModel
+
 
 class ColumnType(str, Enum):
     """Type of column in semantic layer."""
@@ -11,7 +13,7 @@ class ColumnType(str, Enum):
     TIME = "time"
 
 
-class SemanticColumn(BaseModel):
+class SemanticColumn(FrozenModel):
     """A column definition in the semantic layer."""
     name: str = Field(..., description="Column name")
     source_column: str = Field(..., description="Original BigQuery column name")
@@ -21,7 +23,7 @@ class SemanticColumn(BaseModel):
     aggregation: Optional[str] = Field(None, description="Default aggregation for measures (SUM, AVG, COUNT)")
 
 
-class SemanticTable(BaseModel):
+class SemanticTable(FrozenModel):
     """A table definition in the semantic layer."""
     name: str = Field(..., description="Semantic table name")
     source_table: str = Field(..., description="Full BigQuery table reference (dataset.table)")
@@ -29,7 +31,7 @@ class SemanticTable(BaseModel):
     columns: List[SemanticColumn] = Field(default_factory=list, description="Column definitions")
 
 
-class SemanticModel(BaseModel):
+class SemanticModel(FrozenModel):
     """Complete semantic layer model."""
     id: Optional[str] = Field(None, description="Model ID")
     name: str = Field(..., description="Model name")
@@ -39,12 +41,12 @@ class SemanticModel(BaseModel):
     created_at: Optional[str] = Field(None, description="Creation timestamp")
 
 
-class GenerateRequest(BaseModel):
+class GenerateRequest(FrozenModel):
     """Request to generate semantic layer."""
     tables: List[str] = Field(..., description="List of fully qualified table names (dataset.table)")
 
 
-class StreamEvent(BaseModel):
+class StreamEvent(FrozenModel):
     """SSE stream event payload."""
     type: str = Field(..., description="Event type: 'text', 'status', 'done', 'error'")
     content: Optional[str] = Field(None, description="Text content")
@@ -66,7 +68,7 @@ class ConfidenceLevel(str, Enum):
     LOW = "low"
 
 
-class DetectedRelationship(BaseModel):
+class DetectedRelationship(FrozenModel):
     """A relationship detected by the LLM agent."""
     from_table: str = Field(..., description="Source table (dataset.table)")
     from_column: str = Field(..., description="Source column name")
@@ -77,7 +79,7 @@ class DetectedRelationship(BaseModel):
     reasoning: str = Field(..., description="LLM's explanation for why this relationship exists")
 
 
-class RelationshipRequest(BaseModel):
+class RelationshipRequest(FrozenModel):
     """Request to detect relationships in a semantic model."""
     tables: List[Dict[str, Any]] = Field(..., description="List of table schemas with columns")
 
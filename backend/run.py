@@ -0,0 +1,29 @@
+"""Canonical launcher for the Lunara backend.
+
+Runs Uvicorn on uvloop + httptools (both shipped with uvicorn[standard]):
+
+    cd backend && python run.py
+"""
+import os
+
+import uvicorn
+
+
+def main() -> None:
+    """Start the ASGI server."""
+    # Chat sessions and agent caches live in process memory, so default to a
+    # single worker; set WEB_CONCURRENCY to scale out explicitly.
+    workers = int(os.environ.get("WEB_CONCURRENCY", "1"))
+
+    uvicorn.run(
+        "main:app",
+        host=os.environ.get("HOST", "127.0.0.1"),
+        port=int(os.environ.get("PORT", "8000")),
+        loop="uvloop",
+        http="httptools",
+        workers=workers,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,32 +1,59 @@
 """BigQuery service for connection management."""
-import json
 import os
+import time
+from functools import lru_cache
 from pathlib import Path
-from datetime import datetime
-from typing import Optional, Tuple
+from datetime import datetime, timezone
+from typing import Optional, Sequence, Tuple
+import orjson
 from cryptography.fernet import Fernet
 from google.cloud import bigquery
 from google.oauth2 import service_account
 
-from models.connection import ConnectionStatus
+from models.connection import BigQueryCredentials, ConnectionStatus
 
 
+@lru_cache(maxsize=4)
+def _fernet(key: str) -> Fernet:
+    """Build (once per key) the Fernet used to encrypt stored credentials."""
+    return Fernet(key.encode())
+
+
+def _atomic_write(path: Path, data: bytes) -> None:
+    """Write bytes through a sibling temp file so readers never see a partial file.
+    
+    The file is readable by the owner only, as it holds credentials.
+    """
+    tmp_path = path.with_name(path.name + ".tmp")
+    with os.fdopen(os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
 class BigQueryService:
     """Service for managing BigQuery connections and credentials."""
     
     CREDENTIALS_FILE = Path(__file__).parent.parent / "data" / "credentials.enc"
     CONNECTION_INFO_FILE = Path(__file__).parent.parent / "data" / "connection_info.json"
     
+    # Seconds between background liveness probes (see probe())
+    PROBE_INTERVAL = 60.0
+    
     def __init__(self, encryption_key: str):
         """Initialize the BigQuery service.
         
         Args:
             encryption_key: Fernet encryption key for encrypting credentials.
         """
-        self.fernet = Fernet(encryption_key.encode())
+        self.fernet = _fernet(encryption_key)
         self._client: Optional[bigquery.Client] = None
         self._project_id: Optional[str] = None
-        self._connected_at: Optional[str] = None
+        self._connected_at_ts: Optional[float] = None
+        self._probe_failed = False
+        
+        # Decrypted credentials keyed by the credentials file mtime
+        self._cred_cache: Optional[Tuple[int, service_account.Credentials]] = None
         
         # Ensure data directory exists
         self.CREDENTIALS_FILE.parent.mkdir(parents=True, exist_ok=True)
@@ -36,25 +63,32 @@ class BigQueryService:
     
     def _load_existing_connection(self) -> None:
         """Try to load an existing connection from stored credentials."""
-        if self.CREDENTIALS_FILE.exists() and self.CONNECTION_INFO_FILE.exists():
-            try:
-                with open(self.CONNECTION_INFO_FILE, "r") as f:
-                    info = json.load(f)
-                    self._project_id = info.get("project_id")
-                    self._connected_at = info.get("connected_at")
-                    
-                # Validate the connection is still working
-                credentials = self._load_credentials()
-                if credentials:
-                    self._client = bigquery.Client(
-                        credentials=credentials,
-                        project=self._project_id
-                    )
-            except Exception:
-                # If anything fails, reset the connection
-                self._client = None
-                self._project_id = None
-                self._connected_at = None
+        try:
+            info = orjson.loads(self.CONNECTION_INFO_FILE.read_bytes())
+            credentials = self._load_credentials()
+            if credentials is None:
+                return
+            
+            self._project_id = info.get("project_id")
+            self._connected_at_ts = info.get("connected_at_ts")
+            if self._connected_at_ts is None and info.get("connected_at"):
+                # Files written before connected_at_ts carry a naive UTC string
+                self._connected_at_ts = datetime.fromisoformat(
+                    info["connected_at"]
+                ).replace(tzinfo=timezone.utc).timestamp()
+            
+            self._client = bigquery.Client(
+                credentials=credentials,
+                project=self._project_id
+            )
+        except FileNotFoundError:
+            # No saved connection yet
+            return
+        except Exception:
+            # If anything fails, reset the connection
+            self._client = None
+            self._project_id = None
+            self._connected_at_ts = None
     
     def _load_credentials(self) -> Optional[service_account.Credentials]:
         """Load and decrypt stored credentials.
@@ -62,16 +96,20 @@ class BigQueryService:
         Returns:
             Credentials object if successful, None otherwise.
         """
-        if not self.CREDENTIALS_FILE.exists():
-            return None
-            
         try:
+            mtime = self.CREDENTIALS_FILE.stat().st_mtime_ns
+            if self._cred_cache is not None and self._cred_cache[0] == mtime:
+                return self._cred_cache[1]
+            
             with open(self.CREDENTIALS_FILE, "rb") as f:
                 encrypted_data = f.read()
             decrypted_data = self.fernet.decrypt(encrypted_data)
-            credentials_dict = json.loads(decrypted_data.decode())
-            return service_account.Credentials.from_service_account_info(credentials_dict)
+            credentials_dict = orjson.loads(decrypted_data)
+            credentials = service_account.Credentials.from_service_account_info(credentials_dict)
+            self._cred_cache = (mtime, credentials)
+            return credentials
         except Exception:
+            # Includes FileNotFoundError when nothing has been saved yet
             return None
     
     def _save_credentials(self, credentials_dict: dict) -> None:
@@ -80,9 +118,8 @@ class BigQueryService:
         Args:
             credentials_dict: The service account JSON as a dictionary.
         """
-        encrypted_data = self.fernet.encrypt(json.dumps(credentials_dict).encode())
-        with open(self.CREDENTIALS_FILE, "wb") as f:
-            f.write(encrypted_data)
+        encrypted_data = self.fernet.encrypt(orjson.dumps(credentials_dict))
+        _atomic_write(self.CREDENTIALS_FILE, encrypted_data)
     
     def _save_connection_info(self, project_id: str) -> None:
         """Save connection metadata.
@@ -90,36 +127,38 @@ class BigQueryService:
         Args:
             project_id: The BigQuery project ID.
         """
+        connected_at_ts = time.time()
         info = {
             "project_id": project_id,
-            "connected_at": datetime.utcnow().isoformat()
+            "connected_at_ts": connected_at_ts,
+            # Kept for readers of the old format; drop after the next release
+            "connected_at": self._format_timestamp(connected_at_ts),
         }
-        with open(self.CONNECTION_INFO_FILE, "w") as f:
-            json.dump(info, f)
+        _atomic_write(self.CONNECTION_INFO_FILE, orjson.dumps(info))
         self._project_id = project_id
-        self._connected_at = info["connected_at"]
+        self._connected_at_ts = connected_at_ts
+    
+    @staticmethod
+    def _format_timestamp(ts: Optional[float]) -> Optional[str]:
+        """Format a stored epoch timestamp as an ISO 8601 UTC string."""
+        if ts is None:
+            return None
+        return datetime.fromtimestamp(ts, tz=timezone.utc).isoformat()
     
-    def validate_and_connect(self, credentials_dict: dict) -> Tuple[ConnectionStatus, str, Optional[int]]:
+    def validate_and_connect(
+        self, credentials: BigQueryCredentials
+    ) -> Tuple[ConnectionStatus, str, Optional[int]]:
         """Validate credentials and establish a BigQuery connection.
         
         Args:
-            credentials_dict: The service account JSON as a dictionary.
+            credentials: Service account JSON, already validated for required
+                fields by the request model.
             
         Returns:
             Tuple of (status, message, datasets_count).
         """
         try:
-            # Validate required fields
-            required_fields = ["type", "project_id", "private_key", "client_email"]
-            for field in required_fields:
-                if field not in credentials_dict:
-                    return (
-                        ConnectionStatus.ERROR,
-                        f"Missing required field: {field}",
-                        None
-                    )
-            
-            if credentials_dict.get("type") != "service_account":
+            if credentials.type != "service_account":
                 return (
                     ConnectionStatus.ERROR,
                     "Invalid credential type. Expected 'service_account'.",
@@ -127,17 +166,17 @@ class BigQueryService:
                 )
             
             # Create credentials object
-            credentials = service_account.Credentials.from_service_account_info(
+            credentials_dict = credentials.model_dump(exclude_none=True)
+            sa_credentials = service_account.Credentials.from_service_account_info(
                 credentials_dict
             )
             
             # Create BigQuery client and test connection
-            project_id = credentials_dict["project_id"]
-            client = bigquery.Client(credentials=credentials, project=project_id)
+            project_id = credentials.project_id
+            client = bigquery.Client(credentials=sa_credentials, project=project_id)
             
-            # Test by listing datasets
-            datasets = list(client.list_datasets(max_results=100))
-            datasets_count = len(datasets)
+            # Test by listing datasets; count them without building a list
+            datasets_count = sum(1 for _ in client.list_datasets(max_results=100))
             
             # Save encrypted credentials and connection info
             self._save_credentials(credentials_dict)
@@ -145,6 +184,7 @@ class BigQueryService:
             
             # Update instance state
             self._client = client
+            self._probe_failed = False
             
             return (
                 ConnectionStatus.CONNECTED,
@@ -167,29 +207,50 @@ class BigQueryService:
     def get_status(self) -> Tuple[ConnectionStatus, Optional[str], Optional[str]]:
         """Get the current connection status.
         
+        Liveness is checked by probe() in the background, so this only reads
+        cached state and never blocks on BigQuery.
+        
         Returns:
             Tuple of (status, project_id, connected_at).
         """
+        if self._probe_failed:
+            return (ConnectionStatus.ERROR, None, None)
+        
         if self._client is not None and self._project_id is not None:
-            # Verify connection is still valid
-            try:
-                list(self._client.list_datasets(max_results=1))
-                return (ConnectionStatus.CONNECTED, self._project_id, self._connected_at)
-            except Exception:
-                self._client = None
-                return (ConnectionStatus.ERROR, None, None)
+            return (
+                ConnectionStatus.CONNECTED,
+                self._project_id,
+                self._format_timestamp(self._connected_at_ts),
+            )
         
         return (ConnectionStatus.DISCONNECTED, None, None)
     
+    def probe(self) -> None:
+        """Verify the connection is still valid and record the result.
+        
+        Makes a blocking BigQuery call; run it off the event loop.
+        """
+        client = self._client
+        if client is None:
+            return
+        
+        try:
+            list(client.list_datasets(max_results=1))
+        except Exception:
+            # Ignore failures from a client replaced while the probe ran
+            if self._client is client:
+                self._client = None
+                self._probe_failed = True
+    
     def disconnect(self) -> None:
         """Disconnect and remove stored credentials."""
-        if self.CREDENTIALS_FILE.exists():
-            self.CREDENTIALS_FILE.unlink()
-        if self.CONNECTION_INFO_FILE.exists():
-            self.CONNECTION_INFO_FILE.unlink()
+        self.CREDENTIALS_FILE.unlink(missing_ok=True)
+        self.CONNECTION_INFO_FILE.unlink(missing_ok=True)
         self._client = None
         self._project_id = None
-        self._connected_at = None
+        self._connected_at_ts = None
+        self._probe_failed = False
+        self._cred_cache = None
     
     @property
     def client(self) -> Optional[bigquery.Client]:
@@ -201,11 +262,16 @@ class BigQueryService:
         """Get the connected project ID."""
         return self._project_id
 
-    def execute_query(self, sql: str) -> list:
+    def execute_query(
+        self,
+        sql: str,
+        params: Optional[Sequence[bigquery.ScalarQueryParameter]] = None
+    ) -> list:
         """Execute a SQL query and return results as a list of dictionaries.
         
         Args:
             sql: SQL query to execute.
+            params: Optional query parameters referenced as @name in the SQL.
             
         Returns:
             List of row dictionaries.
@@ -213,9 +279,11 @@ class BigQueryService:
         Raises:
             Exception if not connected or query fails.
         """
+        job_config = bigquery.QueryJobConfig(query_parameters=list(params)) if params else None
+        
         # If we have a client from UI-uploaded credentials, use it
         if self._client is not None:
-            query_job = self._client.query(sql)
+            query_job = self._client.query(sql, job_config=job_config)
             results = query_job.result()
             rows = []
             for row in results:
@@ -233,7 +301,7 @@ class BigQueryService:
         credentials = service_account.Credentials.from_service_account_file(str(credentials_path))
         client = bigquery.Client(credentials=credentials, project=credentials.project_id)
         
-        query_job = client.query(sql)
+        query_job = client.query(sql, job_config=job_config)
         results = query_job.result()
         
         rows = []
@@ -5,35 +5,143 @@ This agent generates SQL queries from natural language using the semantic model
 """
 from __future__ import annotations
 
-import os
-import json
-from typing import Optional, Dict, Any, AsyncGenerator, List
+import asyncio
+import functools
+import logging
+import re
+import time
+from collections import OrderedDict
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Final, Optional, Dict, Any, AsyncGenerator, Callable, FrozenSet, List, Tuple, Union
 from datetime import datetime
 from pathlib import Path
 
-# Configure for Vertex AI before importing ADK
-os.environ.setdefault("GOOGLE_CLOUD_PROJECT", "lunara-dev")
-os.environ.setdefault("GOOGLE_CLOUD_LOCATION", "global")
-os.environ.setdefault("GOOGLE_GENAI_USE_VERTEXAI", "True")
+import orjson
+from google.cloud import bigquery
 
-# Set up service account credentials
-PROJECT_ROOT = Path(__file__).parent.parent.parent
-CREDENTIALS_PATH = PROJECT_ROOT / "lunara-dev-094f5e9e682e.json"
-if CREDENTIALS_PATH.exists():
-    os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = str(CREDENTIALS_PATH)
-    print(f"✓ Chat Agent: Using credentials from {CREDENTIALS_PATH}")
-else:
-    print(f"⚠ Chat Agent: Credentials file not found at {CREDENTIALS_PATH}")
+from services.sql_cache import SemanticSQLCache, model_fingerprint
+from services.vertex import setup_gcp_credentials
 
-from google.adk.agents import Agent
-from google.adk.runners import Runner
-from google.adk.sessions import DatabaseSessionService
-from google.genai import types
+if TYPE_CHECKING:
+    from google.adk.runners import Runner
 
 
+logger = logging.getLogger(__name__)
+
 # SQLite database path
 DB_PATH = Path(__file__).parent.parent / "lunara.db"
 
+# Keep session store connections open and reused between calls
+SESSION_ENGINE_KWARGS = {"pool_size": 1, "max_overflow": 4, "pool_pre_ping": True}
+
+# Table and column names the model may put into probe SQL when no semantic
+# model is loaded to check them against
+_IDENTIFIER_RE = re.compile(r"^[A-Za-z_][A-Za-z0-9_\-\.]*$")
+
+# Characters that could break out of a backtick-quoted identifier
+_UNQUOTABLE_RE = re.compile(r"[`\\\r\n]")
+
+# Probe tool results kept per service (cleared when the semantic model changes)
+PROBE_CACHE_MAX = 512
+
+# Seconds numeric/date probes stay valid; they drift as data is ingested
+PROBE_STATS_TTL = 1800.0
+
+# System instruction for the text-to-SQL agent
+_CHAT_SYSTEM_INSTRUCTION: Final[str] = """You are an expert SQL analyst for the Lunara BI platform.
+
+Your task is to generate accurate BigQuery SQL queries from natural language questions.
+
+You have these tools available:
+
+1. get_semantic_context() - Get tables, columns, relationships. Call this first.
+2. lookup_column_values(table, column) - Get distinct values. Use before filtering by a categorical column.
+3. get_date_range(table, column) - Get min/max dates. Use for time-based queries.
+4. get_column_stats(table, column) - Get min/max/avg for numbers. Use for thresholds.
+5. preview_table(table) - Get sample rows. Use to understand data format.
+6. search_value(table, column, term) - Fuzzy search values. Use when user mentions a name/term.
+7. generate_sql(sql, explanation) - Output the final SQL query.
+
+Workflow:
+1. Call get_semantic_context to understand available data
+2. Use exploration tools to verify values, dates, or thresholds as needed
+3. Generate accurate SQL with generate_sql
+
+Guidelines:
+- Always verify filter values using lookup_column_values or search_value
+- Use get_date_range to understand date boundaries for time queries
+- Use get_column_stats to determine reasonable thresholds
+- Use proper BigQuery SQL syntax with backticks for table names
+- Be concise in your explanations"""
+
+
+@dataclass(slots=True)
+class _ChatTurn:
+    """Tool state for a single chat() call."""
+    sql: Optional[str] = None
+    explanation: str = ""
+    # Whether get_semantic_context() already returned the full model
+    context_sent: bool = False
+
+
+# Turn being handled in the current task; tools write to it instead of the
+# shared service so concurrent chat() calls keep their own SQL
+_CURRENT_TURN: ContextVar[Optional[_ChatTurn]] = ContextVar("chat_turn", default=None)
+
+
+def _set_session_pragmas(dbapi_connection, connection_record) -> None:
+    """Use WAL without per-commit fsync on session store connections."""
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.close()
+
+
+def _tool_error(e: Exception) -> dict:
+    """Describe a failed tool call to the model.
+    
+    Uses the exception's message rather than str(e), which for Google API
+    errors renders the whole request/response. The traceback is logged only
+    when debug logging is enabled.
+    """
+    logger.debug("Chat tool failed", exc_info=e)
+    message = getattr(e, "message", None)
+    if message is None:
+        message = str(e.args[0]) if e.args else ""
+    return {"error": type(e).__name__, "message": message}
+
+
+def _cached_probe(ttl: Optional[float] = None) -> Callable:
+    """Cache a probe tool's successful results in the service's LRU.
+    
+    Results are keyed by tool name and arguments; errors are never cached.
+    
+    Args:
+        ttl: Seconds a result stays valid, or None to keep it until evicted.
+    """
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        async def wrapper(self: ChatAgentService, *args, **kwargs) -> dict:
+            key = (func.__name__, args, tuple(sorted(kwargs.items())))
+            cache = self._probe_cache
+            entry = cache.get(key)
+            if entry is not None:
+                expires, result = entry
+                if expires is None or expires > time.monotonic():
+                    cache.move_to_end(key)
+                    return result
+                del cache[key]
+            
+            result = await func(self, *args, **kwargs)
+            if "error" not in result:
+                cache[key] = (time.monotonic() + ttl if ttl else None, result)
+                if len(cache) > PROBE_CACHE_MAX:
+                    cache.popitem(last=False)
+            return result
+        return wrapper
+    return decorator
+
 
 class ChatAgentService:
     """Service for text-to-SQL chat using LLM agent with persistent sessions."""
@@ -44,18 +152,38 @@ class ChatAgentService:
         Args:
             bigquery_service: BigQueryService instance for query execution.
         """
+        # ADK is imported on first use so app startup does not pay for it;
+        # Vertex AI must be configured before the import
+        setup_gcp_credentials()
+        from google.adk.agents import Agent
+        from google.adk.sessions import DatabaseSessionService
+        from sqlalchemy import event as sa_event
+        
         self.bq_service = bigquery_service
         self._runner: Optional[Runner] = None
         self._session_id: Optional[str] = None
-        self._semantic_model: Optional[Dict] = None
-        self._generated_sql: Optional[str] = None
+        self._model_hash: str = model_fingerprint(None)
+        # Formatted semantic context, rebuilt only when the model changes
+        self._semantic_context_cached: Optional[dict] = None
+        # Table name -> column names from the semantic model, for probe SQL
+        self._allowed_columns: Dict[str, FrozenSet[str]] = {}
+        # (tool, args, kwargs) -> (expiry or None, result), least recent first
+        self._probe_cache: OrderedDict[Tuple, Tuple[Optional[float], dict]] = OrderedDict()
+        # SQL from the most recently completed turn, for get_last_sql()
+        self._last_sql: Optional[str] = None
+        # Question asked in the previous turn, part of the SQL cache key: ""
+        # for a fresh session, None while unknown (e.g. a restored session)
+        self._previous_question: Optional[str] = None
+        
+        # Answers for near-duplicate questions, reused without an LLM call
+        self._sql_cache = SemanticSQLCache()
         
         # Create the agent with tools
         self.agent = Agent(
             model="gemini-3-flash-preview",
             name="chat_agent",
             description="Generates SQL queries from natural language using semantic model context",
-            instruction=self._get_system_instruction(),
+            instruction=_CHAT_SYSTEM_INSTRUCTION,
             tools=[
                 self.get_semantic_context,
                 self.lookup_column_values,
@@ -67,42 +195,23 @@ class ChatAgentService:
             ],
         )
         
-        # SQLite session service for persistence
+        # SQLite session service for persistence (async driver, so session
+        # reads and writes do not block the event loop)
         self._session_service = DatabaseSessionService(
-            db_url=f"sqlite:///{DB_PATH}"
+            db_url=f"sqlite+aiosqlite:///{DB_PATH}",
+            **SESSION_ENGINE_KWARGS
         )
+        engine = getattr(self._session_service, "db_engine", None)
+        if engine is not None:
+            sa_event.listen(
+                getattr(engine, "sync_engine", engine), "connect", _set_session_pragmas
+            )
     
-    def _get_system_instruction(self) -> str:
-        """Get the system instruction for the agent."""
-        return """You are an expert SQL analyst for the Lunara BI platform.
-
-Your task is to generate accurate BigQuery SQL queries from natural language questions.
-
-You have these tools available:
-
-1. get_semantic_context() - Get tables, columns, relationships. Call this first.
-2. lookup_column_values(table, column) - Get distinct values. Use before filtering by a categorical column.
-3. get_date_range(table, column) - Get min/max dates. Use for time-based queries.
-4. get_column_stats(table, column) - Get min/max/avg for numbers. Use for thresholds.
-5. preview_table(table) - Get sample rows. Use to understand data format.
-6. search_value(table, column, term) - Fuzzy search values. Use when user mentions a name/term.
-7. generate_sql(sql, explanation) - Output the final SQL query.
-
-Workflow:
-1. Call get_semantic_context to understand available data
-2. Use exploration tools to verify values, dates, or thresholds as needed
-3. Generate accurate SQL with generate_sql
-
-Guidelines:
-- Always verify filter values using lookup_column_values or search_value
-- Use get_date_range to understand date boundaries for time queries
-- Use get_column_stats to determine reasonable thresholds
-- Use proper BigQuery SQL syntax with backticks for table names
-- Be concise in your explanations"""
-
     async def initialize(self, user_id: str = "default"):
         """Initialize the runner and session with persistence."""
         if self._runner is None:
+            from google.adk.runners import Runner
+            
             self._runner = Runner(
                 agent=self.agent,
                 app_name="lunara_chat",
@@ -111,13 +220,13 @@ Guidelines:
             
             # Try to get existing session or create new one
             try:
-                sessions = await self._session_service.list_sessions(
+                response = await self._session_service.list_sessions(
                     app_name="lunara_chat",
                     user_id=user_id
                 )
-                if sessions:
-                    self._session_id = sessions[0].id
-                    print(f"✓ Restored existing session: {self._session_id}")
+                if response.sessions:
+                    self._session_id = response.sessions[0].id
+                    logger.info("Restored existing session: %s", self._session_id)
                 else:
                     session = await self._session_service.create_session(
                         app_name="lunara_chat",
@@ -125,7 +234,8 @@ Guidelines:
                         state={"messages": []}
                     )
                     self._session_id = session.id
-                    print(f"✓ Created new session: {self._session_id}")
+                    self._previous_question = ""
+                    logger.info("Created new session: %s", self._session_id)
             except Exception as e:
                 # Fallback: create new session
                 session = await self._session_service.create_session(
@@ -134,11 +244,32 @@ Guidelines:
                     state={"messages": []}
                 )
                 self._session_id = session.id
-                print(f"✓ Created new session (fallback): {self._session_id}")
+                self._previous_question = ""
+                logger.warning(
+                    "Session lookup failed (%s); created new session: %s", e, self._session_id
+                )
 
-    def set_semantic_model(self, model: Dict):
-        """Set the semantic model context for query generation."""
-        self._semantic_model = model
+    def set_semantic_model(self, model: Optional[Dict]):
+        """Set the semantic model context for query generation.
+        
+        The formatted context is rebuilt only when the model content changes.
+        """
+        model_hash = model_fingerprint(model)
+        if model_hash == self._model_hash:
+            return
+        
+        self._model_hash = model_hash
+        self._probe_cache.clear()
+        if model:
+            self._semantic_context_cached = self._build_context(model)
+            self._allowed_columns = {
+                table["name"]: frozenset(col["name"] for col in table["columns"])
+                for table in self._semantic_context_cached["tables"]
+                if table["name"]
+            }
+        else:
+            self._semantic_context_cached = None
+            self._allowed_columns = {}
 
     def get_semantic_context(self) -> dict:
         """
@@ -147,16 +278,30 @@ Guidelines:
         Returns:
             Dictionary containing tables, columns, relationships, and their meanings.
         """
-        if not self._semantic_model:
+        if self._semantic_context_cached is None:
             return {"error": "No semantic model loaded"}
         
-        # Format the semantic model for the LLM
+        # The model already has the full context from earlier in this turn;
+        # don't spend its tokens on the same payload again
+        turn = _CURRENT_TURN.get()
+        if turn is not None:
+            if turn.context_sent:
+                return {
+                    "note": "semantic context already provided in prior tool call this turn",
+                    "schema_hash": self._model_hash,
+                }
+            turn.context_sent = True
+        return self._semantic_context_cached
+
+    @staticmethod
+    def _build_context(model: Dict) -> dict:
+        """Format a semantic model for the LLM."""
         context = {
             "tables": [],
-            "relationships": self._semantic_model.get("relationships", [])
+            "relationships": model.get("relationships", [])
         }
         
-        for table in self._semantic_model.get("tables", []):
+        for table in model.get("tables", []):
             table_info = {
                 "name": table.get("table_id", table.get("name")),
                 "columns": []
@@ -184,14 +329,48 @@ Guidelines:
         Returns:
             Confirmation that SQL was generated.
         """
-        self._generated_sql = sql_query
+        turn = _CURRENT_TURN.get()
+        if turn is not None:
+            turn.sql = sql_query
+            turn.explanation = explanation
         return {
             "status": "success",
             "sql": sql_query,
             "explanation": explanation
         }
 
-    def lookup_column_values(self, table: str, column: str, limit: int = 25) -> dict:
+    def _check_identifiers(self, table: str, column: Optional[str] = None) -> None:
+        """Validate identifiers before they are interpolated into probe SQL.
+        
+        Once a semantic model is loaded, names must refer to one of its tables
+        and columns (which may use any characters BigQuery allows, except ones
+        that end a quoted identifier); until then they must be plain identifiers.
+        
+        Raises:
+            ValueError: If the table or column may not be queried.
+        """
+        if not self._allowed_columns:
+            for name in (table, column):
+                if name is not None and not _IDENTIFIER_RE.match(name):
+                    raise ValueError(f"Invalid identifier: {name!r}")
+            return
+        
+        columns = self._allowed_columns.get(table)
+        if columns is None:
+            # Accept a known dataset.table qualified with the connected project
+            project, _, dataset_table = table.partition(".")
+            if project and project == self.bq_service.project_id:
+                columns = self._allowed_columns.get(dataset_table)
+        if columns is None:
+            raise ValueError(f"Unknown table: {table}")
+        if column is not None and column not in columns:
+            raise ValueError(f"Unknown column '{column}' in table {table}")
+        for name in (table, column):
+            if name is not None and _UNQUOTABLE_RE.search(name):
+                raise ValueError(f"Invalid identifier: {name!r}")
+
+    @_cached_probe()
+    async def lookup_column_values(self, table: str, column: str, limit: int = 25) -> dict:
         """
         Get distinct values from a column. Use this to verify exact values before filtering.
         
@@ -204,14 +383,18 @@ Guidelines:
             List of distinct values in the column.
         """
         try:
-            sql = f"SELECT DISTINCT `{column}` FROM `{table}` WHERE `{column}` IS NOT NULL LIMIT {limit}"
-            results = self.bq_service.execute_query(sql)
+            self._check_identifiers(table, column)
+            sql = f"SELECT DISTINCT `{column}` FROM `{table}` WHERE `{column}` IS NOT NULL LIMIT @lim"
+            results = await self._run_probe(
+                sql, [bigquery.ScalarQueryParameter("lim", "INT64", limit)]
+            )
             values = [row[column] for row in results]
             return {"values": values, "count": len(values)}
         except Exception as e:
-            return {"error": str(e)}
+            return _tool_error(e)
 
-    def get_date_range(self, table: str, column: str) -> dict:
+    @_cached_probe(ttl=PROBE_STATS_TTL)
+    async def get_date_range(self, table: str, column: str) -> dict:
         """
         Get the min and max dates from a date/timestamp column.
         
@@ -223,8 +406,9 @@ Guidelines:
             Min and max dates in the column.
         """
         try:
-            sql = f"SELECT MIN(`{column}`) as min_date, MAX(`{column}`) as max_date FROM `{table}`"
-            results = self.bq_service.execute_query(sql)
+            self._check_identifiers(table, column)
+            sql = f"SELECT MIN(`{column}`) AS min_date, MAX(`{column}`) AS max_date FROM `{table}`"
+            results = await self._run_probe(sql)
             if results:
                 return {
                     "min_date": str(results[0].get("min_date")),
@@ -232,9 +416,10 @@ Guidelines:
                 }
             return {"error": "No results"}
         except Exception as e:
-            return {"error": str(e)}
+            return _tool_error(e)
 
-    def get_column_stats(self, table: str, column: str) -> dict:
+    @_cached_probe(ttl=PROBE_STATS_TTL)
+    async def get_column_stats(self, table: str, column: str) -> dict:
         """
         Get statistics (min, max, avg, count) for a numeric column.
         
@@ -246,15 +431,12 @@ Guidelines:
             Statistics: min, max, avg, count of the column.
         """
         try:
-            sql = f"""
-                SELECT 
-                    MIN(`{column}`) as min_val,
-                    MAX(`{column}`) as max_val,
-                    AVG(`{column}`) as avg_val,
-                    COUNT(`{column}`) as count_val
-                FROM `{table}`
-            """
-            results = self.bq_service.execute_query(sql)
+            self._check_identifiers(table, column)
+            sql = (
+                f"SELECT MIN(`{column}`) AS min_val, MAX(`{column}`) AS max_val, "
+                f"AVG(`{column}`) AS avg_val, COUNT(`{column}`) AS count_val FROM `{table}`"
+            )
+            results = await self._run_probe(sql)
             if results:
                 return {
                     "min": results[0].get("min_val"),
@@ -264,9 +446,10 @@ Guidelines:
                 }
             return {"error": "No results"}
         except Exception as e:
-            return {"error": str(e)}
+            return _tool_error(e)
 
-    def preview_table(self, table: str, limit: int = 5) -> dict:
+    @_cached_probe()
+    async def preview_table(self, table: str, limit: int = 5) -> dict:
         """
         Get sample rows from a table to understand its data format.
         
@@ -278,13 +461,17 @@ Guidelines:
             Sample rows from the table.
         """
         try:
-            sql = f"SELECT * FROM `{table}` LIMIT {limit}"
-            results = self.bq_service.execute_query(sql)
+            self._check_identifiers(table)
+            sql = f"SELECT * FROM `{table}` LIMIT @lim"
+            results = await self._run_probe(
+                sql, [bigquery.ScalarQueryParameter("lim", "INT64", limit)]
+            )
             return {"rows": results, "count": len(results)}
         except Exception as e:
-            return {"error": str(e)}
+            return _tool_error(e)
 
-    def search_value(self, table: str, column: str, search_term: str, limit: int = 10) -> dict:
+    @_cached_probe()
+    async def search_value(self, table: str, column: str, search_term: str, limit: int = 10) -> dict:
         """
         Search for values in a column that contain the search term (case-insensitive).
         
@@ -298,44 +485,70 @@ Guidelines:
             Matching values from the column.
         """
         try:
-            sql = f"""
-                SELECT DISTINCT `{column}` 
-                FROM `{table}` 
-                WHERE LOWER(CAST(`{column}` AS STRING)) LIKE LOWER('%{search_term}%')
-                LIMIT {limit}
-            """
-            results = self.bq_service.execute_query(sql)
+            self._check_identifiers(table, column)
+            sql = (
+                f"SELECT DISTINCT `{column}` FROM `{table}` "
+                f"WHERE LOWER(CAST(`{column}` AS STRING)) LIKE CONCAT('%', LOWER(@term), '%') "
+                f"LIMIT @lim"
+            )
+            results = await self._run_probe(sql, [
+                bigquery.ScalarQueryParameter("term", "STRING", search_term),
+                bigquery.ScalarQueryParameter("lim", "INT64", limit),
+            ])
             values = [row[column] for row in results]
             return {"matches": values, "count": len(values)}
         except Exception as e:
-            return {"error": str(e)}
+            return _tool_error(e)
+
+    async def _run_probe(
+        self,
+        sql: str,
+        params: Optional[List[bigquery.ScalarQueryParameter]] = None
+    ) -> list:
+        """Run a BigQuery query in a worker thread.
+        
+        The BigQuery client is blocking; running it off the event loop lets
+        ADK execute parallel tool calls from one model turn concurrently.
+        """
+        return await asyncio.to_thread(self.bq_service.execute_query, sql, params)
 
     def get_last_sql(self) -> Optional[str]:
         """Get the last generated SQL query."""
-        return self._generated_sql
+        return self._last_sql
 
     async def chat(
         self,
         message: str,
-        semantic_model: Optional[Dict] = None
-    ) -> AsyncGenerator[Dict[str, Any], None]:
+        semantic_model: Optional[Dict] = None,
+        as_bytes: bool = False
+    ) -> AsyncGenerator[Union[Dict[str, Any], bytes], None]:
         """
         Process a chat message and generate SQL.
         
         Args:
             message: User's natural language question
             semantic_model: Optional semantic model to use for context
+            as_bytes: If True, yield each event already serialized as JSON bytes
+                      so callers can forward it without re-encoding.
             
         Yields:
             Stream events with response text and generated SQL.
         """
+        async for event in self._chat(message, semantic_model):
+            yield orjson.dumps(event) if as_bytes else event
+
+    async def _chat(
+        self,
+        message: str,
+        semantic_model: Optional[Dict] = None
+    ) -> AsyncGenerator[Dict[str, Any], None]:
+        """Yield chat events as dicts."""
         await self.initialize()
         
         if semantic_model:
             self.set_semantic_model(semantic_model)
         
-        # Reset generated SQL
-        self._generated_sql = None
+        from google.genai import types
         
         # Create user message
         user_content = types.Content(
@@ -343,37 +556,98 @@ Guidelines:
             parts=[types.Part(text=message)]
         )
         
+        # Same question, model and preceding question as an earlier turn:
+        # skip the LLM entirely. Only used while the conversation context is
+        # known, so follow-ups are never answered from another conversation.
+        model_hash = self._model_hash
+        previous = self._previous_question
+        cached = None if previous is None else self._sql_cache.get(model_hash, message, previous)
+        if cached is not None:
+            explanation = cached.explanation or "Reusing a previously generated query."
+            self._last_sql = cached.sql
+            self._previous_question = message
+            await self._record_cached_turn(user_content, explanation, cached.sql)
+            yield {"type": "text", "content": explanation}
+            yield {"type": "sql", "content": cached.sql}
+            yield {"type": "done", "content": "Query generated!"}
+            return
+        
         # Stream the agent response
+        run_async = self._runner.run_async
+        turn = _ChatTurn()
+        token = _CURRENT_TURN.set(turn)
         try:
-            async for event in self._runner.run_async(
+            async for event in run_async(
                 session_id=self._session_id,
                 user_id="default",
                 new_message=user_content
             ):
-                if event.content and event.content.parts:
-                    for part in event.content.parts:
-                        if hasattr(part, 'text') and part.text:
-                            yield {
-                                "type": "text",
-                                "content": part.text
-                            }
-                        elif hasattr(part, 'function_call') and part.function_call:
-                            yield {
-                                "type": "status",
-                                "content": f"🔧 {part.function_call.name}..."
-                            }
+                content = event.content
+                if not content or not content.parts:
+                    continue
+                for part in content.parts:
+                    text = getattr(part, "text", None)
+                    if text:
+                        yield {"type": "text", "content": text}
+                        continue
+                    function_call = getattr(part, "function_call", None)
+                    if function_call:
+                        yield {"type": "status", "content": f"🔧 {function_call.name}..."}
             
             # Yield the generated SQL if available
-            if self._generated_sql:
+            self._previous_question = message
+            if turn.sql:
+                self._last_sql = turn.sql
+                if previous is not None:
+                    self._sql_cache.put(
+                        model_hash, message, turn.sql, turn.explanation, previous
+                    )
                 yield {
                     "type": "sql",
-                    "content": self._generated_sql
+                    "content": turn.sql
                 }
             
             yield {"type": "done", "content": "Query generated!"}
             
         except Exception as e:
+            # The session may or may not hold this turn now
+            self._previous_question = None
             yield {"type": "error", "content": str(e)}
+        finally:
+            _CURRENT_TURN.reset(token)
+
+    async def _record_cached_turn(self, user_content: Any, explanation: str, sql: str) -> None:
+        """Append a turn answered from the SQL cache to the ADK session.
+        
+        Keeps the session history complete so later follow-ups see the
+        question and the SQL that answered it.
+        """
+        from google.adk.events import Event
+        from google.adk.sessions.base_session_service import GetSessionConfig
+        from google.genai import types
+        
+        try:
+            session = await self._session_service.get_session(
+                app_name="lunara_chat",
+                user_id="default",
+                session_id=self._session_id,
+                config=GetSessionConfig(num_recent_events=1),
+            )
+            if session is None:
+                return
+            invocation_id = f"e-{Event.new_id()}"
+            reply = types.Content(
+                role="model",
+                parts=[types.Part(text=f"{explanation}\n\n```sql\n{sql}\n```")]
+            )
+            await self._session_service.append_event(
+                session, Event(invocation_id=invocation_id, author="user", content=user_content)
+            )
+            await self._session_service.append_event(
+                session, Event(invocation_id=invocation_id, author=self.agent.name, content=reply)
+            )
+        except Exception as e:
+            logger.warning("Could not record cached turn in session: %s", e)
 
     async def execute_query(self, sql: str) -> Dict[str, Any]:
         """
@@ -386,7 +660,7 @@ Guidelines:
             Query results with columns and rows.
         """
         try:
-            results = self.bq_service.execute_query(sql)
+            results = await self._run_probe(sql)
             return {
                 "success": True,
                 "data": results
@@ -0,0 +1,44 @@
+"""Keyed registry for long-lived agent service instances."""
+from __future__ import annotations
+
+import asyncio
+from typing import Callable, Dict, Generic, TypeVar
+
+
+T = TypeVar("T")
+
+# Key used until requests carry a real user identity
+DEFAULT_KEY = "default"
+
+
+class AgentRegistry(Generic[T]):
+    """Async-safe registry that lazily creates one service per key."""
+    
+    def __init__(self):
+        """Initialize an empty registry."""
+        self._services: Dict[str, T] = {}
+        self._lock = asyncio.Lock()
+    
+    async def get_or_create(self, key: str, factory: Callable[[], T]) -> T:
+        """Get the service for a key, creating it on first use.
+        
+        Uses double-checked locking so the common hit path never waits on
+        the lock and concurrent first requests build only one instance.
+        
+        Args:
+            key: Registry key (e.g. user ID).
+            factory: Zero-argument callable that builds a new service.
+            
+        Returns:
+            The service registered under the key.
+        """
+        service = self._services.get(key)
+        if service is not None:
+            return service
+        
+        async with self._lock:
+            service = self._services.get(key)
+            if service is None:
+                service = factory()
+                self._services[key] = service
+            return service
@@ -7,50 +7,38 @@ data types, and database conventions.
 """
 from __future__ import annotations
 
-import os
-import json
-from typing import Optional, List, Dict, Any, AsyncGenerator
-from pathlib import Path
-
-# Configure for Vertex AI before importing ADK
-os.environ.setdefault("GOOGLE_CLOUD_PROJECT", "lunara-dev")
-os.environ.setdefault("GOOGLE_CLOUD_LOCATION", "global")
-os.environ.setdefault("GOOGLE_GENAI_USE_VERTEXAI", "True")
-
-# Set up service account credentials
-PROJECT_ROOT = Path(__file__).parent.parent.parent
-CREDENTIALS_PATH = PROJECT_ROOT / "lunara-dev-094f5e9e682e.json"
-if CREDENTIALS_PATH.exists():
-    os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = str(CREDENTIALS_PATH)
-    print(f"✓ Relationship Agent: Using credentials from {CREDENTIALS_PATH}")
-else:
-    print(f"⚠ Relationship Agent: Credentials file not found at {CREDENTIALS_PATH}")
-
-from google.adk.agents import Agent
-from google.adk.runners import InMemoryRunner
-from google.genai import types
+import io
+import re
+from collections import OrderedDict
+from itertools import combinations_with_replacement
+from typing import TYPE_CHECKING, Final, Optional, List, Dict, Any, AsyncGenerator, FrozenSet, Iterable, Set, Tuple, Union
 
+import orjson
 
-class RelationshipAgentService:
-    """Service for detecting relationships between tables using LLM reasoning."""
-    
-    def __init__(self):
-        """Initialize the relationship detection agent."""
-        self._runner: Optional[InMemoryRunner] = None
-        self._session_id: Optional[str] = None
-        
-        # Create the agent (no tools - pure LLM reasoning)
-        self.agent = Agent(
-            model="gemini-3-flash-preview",
-            name="relationship_detection_agent",
-            description="Analyzes semantic models to detect foreign key relationships between tables",
-            instruction=self._get_system_instruction(),
-            tools=[],  # Pure reasoning, no tools needed
-        )
-    
-    def _get_system_instruction(self) -> str:
-        """Get the system instruction for the agent."""
-        return """You are an expert database architect specializing in data modeling and relationship detection.
+from services.sql_cache import model_fingerprint
+from services.vertex import setup_gcp_credentials
+
+if TYPE_CHECKING:
+    from google.adk.runners import InMemoryRunner
+
+
+# Semantic models whose detected relationships are remembered
+RELATIONSHIP_CACHE_SIZE = 32
+
+# Relationships remembered per table fingerprint pair for delta analysis
+KNOWN_RELATIONSHIPS_MAX = 2048
+
+# Analyzed table fingerprint pairs kept before the delta state is reset
+ANALYZED_PAIRS_MAX = 50_000
+
+# (from table fingerprint, from column, to table fingerprint, to column)
+RelationshipKey = Tuple[str, Any, str, Any]
+
+# Fallback for a bare JSON object when the model did not fence its output
+_JSON_OBJ_RE = re.compile(r'\{[^{}]*"relationships"[^{}]*\[.*?\]\s*\}', re.DOTALL)
+
+# System instruction for the relationship detection agent
+_RELATIONSHIP_SYSTEM_INSTRUCTION: Final[str] = """You are an expert database architect specializing in data modeling and relationship detection.
 
 Your task is to analyze semantic layer definitions and detect foreign key relationships between tables.
 
@@ -101,9 +89,40 @@ CONFIDENCE LEVELS:
 
 Be thorough but avoid false positives. Only report relationships you're confident about."""
 
+
+class RelationshipAgentService:
+    """Service for detecting relationships between tables using LLM reasoning."""
+    
+    def __init__(self):
+        """Initialize the relationship detection agent."""
+        # ADK is imported on first use; Vertex AI must be configured first
+        setup_gcp_credentials()
+        from google.adk.agents import Agent
+        
+        self._runner: Optional[InMemoryRunner] = None
+        self._session_id: Optional[str] = None
+        # Model fingerprint -> extracted relationships, least recent first
+        self._relationship_cache: OrderedDict[str, Dict[str, Any]] = OrderedDict()
+        # Pairs of table fingerprints the LLM has already seen together (a
+        # single-table set covers self-references), and the relationships
+        # it found between them
+        self._analyzed_pairs: Set[FrozenSet[str]] = set()
+        self._known_relationships: OrderedDict[RelationshipKey, Dict[str, Any]] = OrderedDict()
+        
+        # Create the agent (no tools - pure LLM reasoning)
+        self.agent = Agent(
+            model="gemini-3-flash-preview",
+            name="relationship_detection_agent",
+            description="Analyzes semantic models to detect foreign key relationships between tables",
+            instruction=_RELATIONSHIP_SYSTEM_INSTRUCTION,
+            tools=[],  # Pure reasoning, no tools needed
+        )
+    
     async def initialize(self) -> None:
         """Initialize the runner and session."""
         if self._runner is None:
+            from google.adk.runners import InMemoryRunner
+            
             self._runner = InMemoryRunner(
                 agent=self.agent,
                 app_name="lunara_relationships"
@@ -117,24 +136,83 @@ Be thorough but avoid false positives. Only report relationships you're confiden
 
     async def detect_relationships(
         self,
-        semantic_model: Dict[str, Any]
-    ) -> AsyncGenerator[Dict[str, Any], None]:
+        semantic_model: Dict[str, Any],
+        as_bytes: bool = False
+    ) -> AsyncGenerator[Union[Dict[str, Any], bytes], None]:
         """
         Detect relationships between tables in a semantic model.
         
         Args:
             semantic_model: The semantic model output from SemanticAgentService,
                            containing tables with their columns and types.
+            as_bytes: If True, yield each event already serialized as JSON bytes
+                      so callers can forward it without re-encoding.
             
         Yields:
             Stream events with analysis progress and detected relationships.
         """
+        async for event in self._detect_relationships(semantic_model):
+            yield orjson.dumps(event) if as_bytes else event
+
+    async def _detect_relationships(
+        self,
+        semantic_model: Dict[str, Any]
+    ) -> AsyncGenerator[Dict[str, Any], None]:
+        """Yield relationship detection events as dicts."""
+        # Same model as an earlier run: reuse its result without the LLM
+        model_hash = model_fingerprint(semantic_model)
+        cached = self._relationship_cache.get(model_hash)
+        if cached is not None:
+            self._relationship_cache.move_to_end(model_hash)
+            yield {"type": "relationships", "data": cached}
+            yield {"type": "done", "content": "Relationship detection complete!"}
+            return
+        
+        # Relationships belong to pairs of tables (by id and columns). The
+        # LLM is asked about pairs involving a new table, so every pair it has
+        # not yet seen together needs at least one side sent as new; the
+        # other tables are only context, as all pairs among them were analyzed
+        tables = self._get_tables(semantic_model)
+        fingerprints = {self._table_id(t): self._table_fingerprint(t) for t in tables}
+        new_fps = self._tables_to_analyze(fingerprints.values())
+        known_tables = [t for t in tables if fingerprints[self._table_id(t)] not in new_fps]
+        new_tables = [t for t in tables if fingerprints[self._table_id(t)] in new_fps]
+        known_relationships = self._relationships_between(
+            fingerprints[self._table_id(t)] for t in known_tables
+        )
+        
+        if tables and not new_tables:
+            relationships = {"relationships": known_relationships}
+            self._cache_relationships(model_hash, relationships)
+            yield {"type": "relationships", "data": relationships}
+            yield {"type": "done", "content": "Relationship detection complete!"}
+            return
+        
         await self.initialize()
         
         # Format the semantic model for the LLM
-        tables_description = self._format_tables_for_prompt(semantic_model)
-        
-        prompt = f"""Analyze these tables from a semantic layer and detect foreign key relationships:
+        if known_tables:
+            new_description = self._format_tables_for_prompt({"tables": new_tables})
+            known_description = self._format_tables_for_prompt({"tables": known_tables})
+            prompt = f"""Analyze these new or changed tables from a semantic layer and detect foreign key relationships:
+
+{new_description}
+
+Consider relationships to these already-known tables (relationships among them are already known):
+
+{known_description}
+
+For each potential relationship you find:
+1. Briefly explain your reasoning
+2. Classify the relationship type (one-to-one, one-to-many, many-to-one, many-to-many)
+3. Rate your confidence (high, medium, low)
+
+Only report relationships that involve at least one new or changed table.
+At the end, output a JSON block with all detected relationships in the specified format."""
+        else:
+            tables_description = self._format_tables_for_prompt(semantic_model)
+            
+            prompt = f"""Analyze these tables from a semantic layer and detect foreign key relationships:
 
 {tables_description}
 
@@ -145,6 +223,8 @@ For each potential relationship you find:
 
 At the end, output a JSON block with all detected relationships in the specified format."""
 
+        from google.genai import types
+        
         # Create user message
         user_content = types.Content(
             role="user",
@@ -152,27 +232,36 @@ At the end, output a JSON block with all detected relationships in the specified
         )
         
         # Track the full response to extract JSON at the end
-        full_response = ""
+        response_chunks: List[str] = []
         
         # Stream the agent response
+        run_async = self._runner.run_async
         try:
-            async for event in self._runner.run_async(
+            async for event in run_async(
                 session_id=self._session_id,
                 user_id="system",
                 new_message=user_content
             ):
-                if event.content and event.content.parts:
-                    for part in event.content.parts:
-                        if hasattr(part, 'text') and part.text:
-                            full_response += part.text
-                            yield {
-                                "type": "text",
-                                "content": part.text
-                            }
+                content = event.content
+                if not content or not content.parts:
+                    continue
+                for part in content.parts:
+                    text = getattr(part, "text", None)
+                    if text:
+                        response_chunks.append(text)
+                        yield {"type": "text", "content": text}
             
             # Try to extract JSON from the response
-            relationships = self._extract_relationships_json(full_response)
+            relationships = self._extract_relationships_json("".join(response_chunks))
             if relationships:
+                detected = relationships.get("relationships") if isinstance(relationships, dict) else None
+                if isinstance(detected, list):
+                    self._remember_relationships(
+                        detected, fingerprints, self._table_aliases(tables, fingerprints)
+                    )
+                    if known_relationships:
+                        relationships = {**relationships, "relationships": known_relationships + detected}
+                self._cache_relationships(model_hash, relationships)
                 yield {
                     "type": "relationships",
                     "data": relationships
@@ -183,54 +272,175 @@ At the end, output a JSON block with all detected relationships in the specified
         except Exception as e:
             yield {"type": "error", "content": str(e)}
 
-    def _format_tables_for_prompt(self, semantic_model: Dict[str, Any]) -> str:
-        """Format semantic model tables for the LLM prompt."""
-        lines = []
+    def _cache_relationships(self, model_hash: str, relationships: Dict[str, Any]) -> None:
+        """Remember the relationships detected for a whole semantic model."""
+        self._relationship_cache[model_hash] = relationships
+        if len(self._relationship_cache) > RELATIONSHIP_CACHE_SIZE:
+            self._relationship_cache.popitem(last=False)
+
+    def _remember_relationships(
+        self,
+        relationships: List[Dict[str, Any]],
+        fingerprints: Dict[str, str],
+        aliases: Dict[str, str]
+    ) -> None:
+        """Record the relationships found and, if all resolved, the pairs analyzed.
+        
+        A relationship naming a table that cannot be matched is lost, so the
+        pairs stay unanalyzed and the tables are sent to the LLM again.
+        """
+        resolved: List[Tuple[RelationshipKey, Dict[str, Any]]] = []
+        complete = True
+        for rel in relationships:
+            if not isinstance(rel, dict):
+                continue
+            from_fp = aliases.get(str(rel.get("from_table", "")).strip("` "))
+            to_fp = aliases.get(str(rel.get("to_table", "")).strip("` "))
+            if from_fp is None or to_fp is None:
+                complete = False
+                continue
+            resolved.append(((from_fp, rel.get("from_column"), to_fp, rel.get("to_column")), rel))
         
-        tables = semantic_model.get("tables", [])
-        if not tables:
-            # If no structured tables, try to use raw schema info
-            tables = semantic_model.get("schemas", [])
+        if complete:
+            pairs = self._table_pairs(fingerprints.values())
+            if len(self._analyzed_pairs) + len(pairs) > ANALYZED_PAIRS_MAX:
+                self._analyzed_pairs.clear()
+                self._known_relationships.clear()
+            self._analyzed_pairs.update(pairs)
+        
+        for key, rel in resolved:
+            self._known_relationships[key] = rel
+            self._known_relationships.move_to_end(key)
+        while len(self._known_relationships) > KNOWN_RELATIONSHIPS_MAX:
+            self._known_relationships.popitem(last=False)
+
+    def _relationships_between(self, fingerprints: Iterable[str]) -> List[Dict[str, Any]]:
+        """Known relationships whose tables are all among the given fingerprints."""
+        fps = set(fingerprints)
+        if not fps:
+            return []
+        return [
+            rel for (from_fp, _, to_fp, _), rel in self._known_relationships.items()
+            if from_fp in fps and to_fp in fps
+        ]
+
+    def _tables_to_analyze(self, fingerprints: Iterable[str]) -> Set[str]:
+        """Tables to send as new so that every unanalyzed pair involves one."""
+        uncovered = sorted(
+            (sorted(pair) for pair in self._table_pairs(fingerprints)
+             if pair not in self._analyzed_pairs),
+            key=lambda pair: (len(pair), pair)
+        )
+        new: Set[str] = set()
+        # Tables never analyzed at all come first; they cover most pairs
+        for pair in uncovered:
+            if len(pair) == 1:
+                new.update(pair)
+            elif not new.intersection(pair):
+                # Both seen before, but never together
+                new.update(pair)
+        return new
+
+    @staticmethod
+    def _table_pairs(fingerprints: Iterable[str]) -> Set[FrozenSet[str]]:
+        """Every unordered pair of tables, including each table with itself."""
+        return {
+            frozenset(pair)
+            for pair in combinations_with_replacement(sorted(set(fingerprints)), 2)
+        }
+
+    @classmethod
+    def _table_aliases(
+        cls,
+        tables: List[Dict[str, Any]],
+        fingerprints: Dict[str, str]
+    ) -> Dict[str, str]:
+        """Map each name the LLM may use for a table to its fingerprint.
         
+        Besides the full id, a trailing part of it ("dataset.table", "table")
+        or the table's name resolves when no other table shares it.
+        """
+        aliases: Dict[str, Optional[str]] = {}
         for table in tables:
-            table_id = table.get("table_id") or table.get("name", "unknown")
-            lines.append(f"\n### Table: {table_id}")
+            table_id = cls._table_id(table)
+            fp = fingerprints[table_id]
+            parts = table_id.split(".")
+            names = {".".join(parts[i:]) for i in range(1, len(parts))}
+            if table.get("name"):
+                names.add(str(table["name"]))
+            for name in names:
+                aliases[name] = fp if aliases.get(name, fp) == fp else None
+        aliases.update(fingerprints)
+        return {name: fp for name, fp in aliases.items() if fp is not None}
+
+    @staticmethod
+    def _get_tables(semantic_model: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Tables of a semantic model, falling back to raw schema info."""
+        return semantic_model.get("tables") or semantic_model.get("schemas", [])
+
+    @staticmethod
+    def _table_id(table: Dict[str, Any]) -> str:
+        """Identifier the prompt and detected relationships use for a table."""
+        return str(table.get("table_id") or table.get("name", "unknown"))
+
+    @classmethod
+    def _table_fingerprint(cls, table: Dict[str, Any]) -> str:
+        """Identify a table by its id plus sorted column names and types."""
+        columns = ",".join(sorted(
+            f"{col.get('name')}:{col.get('type') or col.get('data_type')}"
+            for col in table.get("columns", [])
+        ))
+        return f"{cls._table_id(table)}|{columns}"
+
+    def _format_tables_for_prompt(self, semantic_model: Dict[str, Any]) -> str:
+        """Format semantic model tables for the LLM prompt."""
+        buf = io.StringIO()
+        write = buf.write
+        
+        for table in self._get_tables(semantic_model):
+            get = table.get
+            write("\n\n### Table: ")
+            write(self._table_id(table))
             
-            if table.get("description"):
-                lines.append(f"Description: {table['description']}")
+            description = get("description")
+            if description:
+                write("\nDescription: ")
+                write(str(description))
             
-            columns = table.get("columns", [])
+            columns = get("columns", [])
             if columns:
-                lines.append("Columns:")
+                write("\nColumns:")
                 for col in columns:
-                    col_name = col.get("name", "unknown")
-                    col_type = col.get("type") or col.get("data_type", "unknown")
-                    semantic_type = col.get("semantic_type") or col.get("suggested_type", "")
-                    
-                    col_line = f"  - {col_name} ({col_type})"
+                    get_col = col.get
+                    write("\n  - ")
+                    write(str(get_col("name", "unknown")))
+                    write(" (")
+                    write(str(get_col("type") or get_col("data_type", "unknown")))
+                    write(")")
+                    semantic_type = get_col("semantic_type") or get_col("suggested_type", "")
                     if semantic_type:
-                        col_line += f" [semantic: {semantic_type}]"
-                    lines.append(col_line)
+                        write(" [semantic: ")
+                        write(str(semantic_type))
+                        write("]")
         
-        return "\n".join(lines)
+        # Drop the separator written before the first table
+        return buf.getvalue()[1:]
 
     def _extract_relationships_json(self, response: str) -> Optional[Dict[str, Any]]:
         """Extract JSON relationship data from the LLM response."""
         try:
-            # Look for JSON block in the response
-            import re
-            
-            # Try to find JSON between ```json and ``` markers
-            json_match = re.search(r'```json\s*(.*?)\s*```', response, re.DOTALL)
-            if json_match:
-                json_str = json_match.group(1)
-                return json.loads(json_str)
+            # The JSON block comes last: find the final ```json fence directly
+            start = response.rfind("```json")
+            if start != -1:
+                end = response.find("```", start + 7)
+                if end != -1:
+                    return orjson.loads(response[start + 7:end].strip())
             
             # Try to find raw JSON object
-            json_match = re.search(r'\{[^{}]*"relationships"[^{}]*\[.*?\]\s*\}', response, re.DOTALL)
+            json_match = _JSON_OBJ_RE.search(response)
             if json_match:
-                return json.loads(json_match.group(0))
+                return orjson.loads(json_match.group(0))
             
             return None
-        except (json.JSONDecodeError, AttributeError):
+        except (orjson.JSONDecodeError, AttributeError):
             return None
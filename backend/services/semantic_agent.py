@@ -6,30 +6,38 @@ with dimensions, measures, and time columns.
 """
 from __future__ import annotations
 
-import os
-import json
-from typing import Optional, List, Dict, Any, AsyncGenerator
+from typing import TYPE_CHECKING, Final, Optional, List, Dict, Any, AsyncGenerator
 from datetime import datetime
-from pathlib import Path
 
-# Configure for Vertex AI before importing ADK
-os.environ.setdefault("GOOGLE_CLOUD_PROJECT", "lunara-dev")
-os.environ.setdefault("GOOGLE_CLOUD_LOCATION", "global")
-os.environ.setdefault("GOOGLE_GENAI_USE_VERTEXAI", "True")
+import orjson
 
-# Set up service account credentials
-# Look for credentials file in project root
-PROJECT_ROOT = Path(__file__).parent.parent.parent
-CREDENTIALS_PATH = PROJECT_ROOT / "lunara-dev-094f5e9e682e.json"
-if CREDENTIALS_PATH.exists():
-    os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = str(CREDENTIALS_PATH)
-    print(f"✓ Semantic Agent: Using credentials from {CREDENTIALS_PATH}")
-else:
-    print(f"⚠ Semantic Agent: Credentials file not found at {CREDENTIALS_PATH}")
+from services.vertex import setup_gcp_credentials
 
-from google.adk.agents import Agent
-from google.adk.runners import InMemoryRunner
-from google.genai import types
+if TYPE_CHECKING:
+    from google.adk.runners import InMemoryRunner
+
+
+# System instruction for the semantic layer agent
+_SEMANTIC_SYSTEM_INSTRUCTION: Final[str] = """You are an expert data modeler for the Lunara BI platform.
+
+Your task is to analyze BigQuery table schemas and generate semantic layer definitions.
+
+For each table:
+1. Fetch the schema using get_table_schema
+2. Analyze ALL columns together, then call classify_table_columns ONCE with a JSON array of all classifications
+
+When classifying columns, for each column provide:
+- name: column name
+- semantic_type: 'dimension', 'measure', or 'time'
+- description: clear, business-friendly description (e.g., "Customer's first name")
+- aggregation: for measures only, specify SUM, AVG, COUNT, MIN, MAX
+
+Output your thinking conversationally:
+- "🔍 Analyzing table X with Y columns..."
+- Brief summary of what you found
+- "✅ Classified X dimensions, Y measures, Z time columns"
+
+Be concise. Process each table completely before moving to the next."""
 
 
 class SemanticAgentService:
@@ -41,6 +49,10 @@ class SemanticAgentService:
         Args:
             bigquery_service: BigQueryService instance for schema access.
         """
+        # ADK is imported on first use; Vertex AI must be configured first
+        setup_gcp_credentials()
+        from google.adk.agents import Agent
+        
         self.bq_service = bigquery_service
         self._runner: Optional[InMemoryRunner] = None
         self._session_id: Optional[str] = None
@@ -51,39 +63,18 @@ class SemanticAgentService:
             model="gemini-3-flash-preview",
             name="semantic_layer_agent",
             description="Analyzes BigQuery schemas and generates semantic layer definitions",
-            instruction=self._get_system_instruction(),
+            instruction=_SEMANTIC_SYSTEM_INSTRUCTION,
             tools=[
                 self.get_table_schema,
                 self.classify_table_columns,
             ],
         )
     
-    def _get_system_instruction(self) -> str:
-        """Get the system instruction for the agent."""
-        return """You are an expert data modeler for the Lunara BI platform.
-
-Your task is to analyze BigQuery table schemas and generate semantic layer definitions.
-
-For each table:
-1. Fetch the schema using get_table_schema
-2. Analyze ALL columns together, then call classify_table_columns ONCE with a JSON array of all classifications
-
-When classifying columns, for each column provide:
-- name: column name
-- semantic_type: 'dimension', 'measure', or 'time'
-- description: clear, business-friendly description (e.g., "Customer's first name")
-- aggregation: for measures only, specify SUM, AVG, COUNT, MIN, MAX
-
-Output your thinking conversationally:
-- "🔍 Analyzing table X with Y columns..."
-- Brief summary of what you found
-- "✅ Classified X dimensions, Y measures, Z time columns"
-
-Be concise. Process each table completely before moving to the next."""
-
     async def initialize(self):
         """Initialize the runner and session."""
         if self._runner is None:
+            from google.adk.runners import InMemoryRunner
+            
             self._runner = InMemoryRunner(
                 agent=self.agent,
                 app_name="lunara_semantic"
@@ -149,7 +140,7 @@ Be concise. Process each table completely before moving to the next."""
         """
         try:
             # Parse the JSON array of columns
-            column_list = json.loads(columns) if isinstance(columns, str) else columns
+            column_list = orjson.loads(columns) if isinstance(columns, str) else columns
             
             # Store in cache for later retrieval
             self._table_cache[table_id] = column_list
@@ -167,7 +158,7 @@ Be concise. Process each table completely before moving to the next."""
                 "measures": measures,
                 "time_columns": time_cols
             }
-        except json.JSONDecodeError as e:
+        except orjson.JSONDecodeError as e:
             return {"error": f"Invalid JSON: {str(e)}"}
         except Exception as e:
             return {"error": str(e)}
@@ -211,30 +202,38 @@ For each table:
 Output your thinking step-by-step as you work. At the end, provide a summary of the semantic model you've created."""
 
         # Create user message
+        from google.genai import types
+        
         user_content = types.Content(
             role="user",
             parts=[types.Part(text=prompt)]
         )
         
         # Stream the agent response
+        run_async = self._runner.run_async
         try:
-            async for event in self._runner.run_async(
+            async for event in run_async(
                 session_id=self._session_id,
                 user_id="system",
                 new_message=user_content
             ):
-                if event.content and event.content.parts:
-                    for part in event.content.parts:
-                        if hasattr(part, 'text') and part.text:
-                            yield {
-                                "type": "text",
-                                "content": part.text
-                            }
-                        elif hasattr(part, 'function_call') and part.function_call:
-                            yield {
-                                "type": "status",
-                                "content": f"🔧 Calling {part.function_call.name}..."
-                            }
+                content = event.content
+                if not content or not content.parts:
+                    continue
+                for part in content.parts:
+                    text = getattr(part, "text", None)
+                    if text:
+                        yield {
+                            "type": "text",
+                            "content": text
+                        }
+                        continue
+                    function_call = getattr(part, "function_call", None)
+                    if function_call:
+                        yield {
+                            "type": "status",
+                            "content": f"🔧 Calling {function_call.name}..."
+                        }
             
             # After LLM finishes, collect structured data using cached table classifications
             collected_tables = []
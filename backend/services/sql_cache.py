@@ -0,0 +1,105 @@
+"""Normalized-question cache for SQL generated by the chat agent.
+
+Questions are reduced to their ordered content words (lower-cased, with
+punctuation and conversational filler dropped) and matched exactly against
+earlier questions asked over the same semantic model and after the same
+previous question. Word order and words such as "from", "to", "by" or "not"
+are kept, since they change what is being asked. Entries expire after a TTL
+and the least recently used entry is evicted once the cache is full.
+"""
+from __future__ import annotations
+
+import hashlib
+import re
+import time
+from collections import OrderedDict
+from typing import Any, NamedTuple, Optional, Tuple
+
+import orjson
+
+
+# Maximum number of cached questions
+SQL_CACHE_SIZE = 256
+
+# Seconds a cached answer stays valid
+SQL_CACHE_TTL = 3600.0
+
+_TOKEN_RE = re.compile(r"[a-z0-9_]+")
+
+# Conversational filler that never changes what a question asks for
+_FILLER_WORDS = frozenset({
+    "a", "an", "the", "me", "show", "give", "please", "can", "could", "you",
+    "i", "want", "see", "tell", "would", "like",
+})
+
+
+class CachedSQL(NamedTuple):
+    """A previously generated answer."""
+    sql: str
+    explanation: str
+
+
+def model_fingerprint(model: Any) -> str:
+    """Return a stable hash of a semantic model (key order independent)."""
+    payload = orjson.dumps(model, option=orjson.OPT_SORT_KEYS)
+    return hashlib.blake2b(payload, digest_size=16).hexdigest()
+
+
+def normalize_question(text: str) -> str:
+    """Reduce a question to its ordered content words."""
+    return " ".join(t for t in _TOKEN_RE.findall(text.lower()) if t not in _FILLER_WORDS)
+
+
+class SemanticSQLCache:
+    """TTL + LRU cache returning SQL for repeated questions."""
+
+    def __init__(self, maxsize: int = SQL_CACHE_SIZE, ttl: float = SQL_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        # (model hash, previous question, question) -> (expiry, answer), oldest first
+        self._entries: OrderedDict[Tuple[str, str, str], Tuple[float, CachedSQL]] = OrderedDict()
+
+    def get(self, model_hash: str, question: str, previous: str = "") -> Optional[CachedSQL]:
+        """Return the cached answer for this question in this context, if any.
+
+        Args:
+            model_hash: Fingerprint of the semantic model the SQL targets.
+            question: The user's question.
+            previous: The question asked before it in the conversation, or ""
+                      for the first turn.
+        """
+        key = (model_hash, normalize_question(previous), normalize_question(question))
+        if not key[2]:
+            return None
+
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires, answer = entry
+        if expires <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return answer
+
+    def put(
+        self,
+        model_hash: str,
+        question: str,
+        sql: str,
+        explanation: str = "",
+        previous: str = "",
+    ) -> None:
+        """Remember the answer generated for a question in this context."""
+        key = (model_hash, normalize_question(previous), normalize_question(question))
+        if not key[2]:
+            return
+
+        self._entries[key] = (time.monotonic() + self.ttl, CachedSQL(sql, explanation))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Drop all cached answers."""
+        self._entries.clear()
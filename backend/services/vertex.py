@@ -0,0 +1,41 @@
+"""Shared Vertex AI environment setup for the ADK agents."""
+from __future__ import annotations
+
+import logging
+import os
+from functools import lru_cache
+from pathlib import Path
+from typing import Optional
+
+
+# Service account file looked up in the project root
+PROJECT_ROOT = Path(__file__).parent.parent.parent
+CREDENTIALS_PATH = PROJECT_ROOT / "lunara-dev-094f5e9e682e.json"
+
+logger = logging.getLogger(__name__)
+
+
+@lru_cache(maxsize=1)
+def setup_gcp_credentials() -> Optional[str]:
+    """Configure the process for Vertex AI (once); call before importing ADK.
+
+    Returns:
+        The credentials path exported as GOOGLE_APPLICATION_CREDENTIALS, or
+        None if the service account file is missing.
+    """
+    os.environ.setdefault("GOOGLE_CLOUD_PROJECT", "lunara-dev")
+    os.environ.setdefault("GOOGLE_CLOUD_LOCATION", "global")
+    os.environ.setdefault("GOOGLE_GENAI_USE_VERTEXAI", "True")
+    
+    # Already configured by the runtime (e.g. GCP metadata or deploy env)
+    configured = os.environ.get("GOOGLE_APPLICATION_CREDENTIALS")
+    if configured:
+        return configured
+
+    if not CREDENTIALS_PATH.exists():
+        logger.warning("Vertex AI credentials file not found at %s", CREDENTIALS_PATH)
+        return None
+
+    os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = str(CREDENTIALS_PATH)
+    logger.info("Vertex AI: using credentials from %s", CREDENTIALS_PATH)
+    return str(CREDENTIALS_PATH)
@@ -0,0 +1,123 @@
+"""Tests for incremental relationship detection in RelationshipAgentService."""
+import asyncio
+from types import SimpleNamespace
+from typing import Any, Dict, List
+
+import orjson
+import pytest
+
+from services.relationship_agent import RelationshipAgentService
+
+
+class _StubRunner:
+    """Stands in for the ADK runner, replying with canned relationships."""
+
+    def __init__(self) -> None:
+        self.prompts: List[str] = []
+        self.reply: List[Dict[str, Any]] = []
+
+    async def run_async(self, session_id, user_id, new_message):
+        self.prompts.append(new_message.parts[0].text)
+        text = "```json\n" + orjson.dumps({"relationships": self.reply}).decode() + "\n```"
+        yield SimpleNamespace(content=SimpleNamespace(parts=[SimpleNamespace(text=text)]))
+
+
+def _table(table_id: str, *columns: str) -> Dict[str, Any]:
+    return {"table_id": table_id, "columns": [{"name": c, "type": "INT64"} for c in columns]}
+
+
+def _rel(from_table: str, from_column: str, to_table: str) -> Dict[str, Any]:
+    return {"from_table": from_table, "from_column": from_column, "to_table": to_table, "to_column": "id"}
+
+
+ORDERS = _table("proj.shop.orders", "id", "customer_id", "product_id")
+PRODUCTS = _table("proj.shop.products", "id")
+CUSTOMERS = _table("proj.shop.customers", "id")
+ITEMS = _table("proj.shop.items", "order_id")
+
+
+@pytest.fixture
+def service():
+    svc = RelationshipAgentService()
+    svc._runner = _StubRunner()
+    svc._session_id = "test"
+    return svc
+
+
+def _detect(svc: RelationshipAgentService, tables, **extra) -> List[tuple]:
+    async def run():
+        return [e async for e in svc.detect_relationships({"tables": tables, **extra})]
+
+    events = asyncio.run(run())
+    data = next(e["data"] for e in events if e["type"] == "relationships")
+    return sorted((r["from_table"], r["to_table"]) for r in data["relationships"])
+
+
+def _new_tables(prompt: str) -> int:
+    """Number of tables sent as new (before the already-known section)."""
+    return prompt.split("Consider relationships")[0].count("### Table")
+
+
+def test_unqualified_names_resolve_and_skip_llm_on_rerun(service):
+    service._runner.reply = [_rel("orders", "product_id", "shop.products")]
+    assert _detect(service, [ORDERS, PRODUCTS]) == [("orders", "shop.products")]
+
+    # New generated_at: the model hash changes, the tables do not
+    assert _detect(service, [ORDERS, PRODUCTS], generated_at="later") == [("orders", "shop.products")]
+    assert len(service._runner.prompts) == 1
+
+
+def test_unresolved_relationship_leaves_pairs_unanalyzed(service):
+    service._runner.reply = [_rel("warehouse.orders", "product_id", "products")]
+    _detect(service, [ORDERS, PRODUCTS])
+
+    _detect(service, [ORDERS, PRODUCTS], generated_at="later")
+    assert len(service._runner.prompts) == 2
+
+
+def test_ambiguous_short_name_is_not_resolved(service):
+    other_orders = _table("proj.archive.orders", "id")
+    service._runner.reply = [_rel("orders", "product_id", "products")]
+    _detect(service, [ORDERS, other_orders, PRODUCTS])
+
+    _detect(service, [ORDERS, other_orders, PRODUCTS], generated_at="later")
+    assert len(service._runner.prompts) == 2
+
+
+def test_subset_of_analyzed_model_skips_llm(service):
+    service._runner.reply = [
+        _rel(ORDERS["table_id"], "product_id", PRODUCTS["table_id"]),
+        _rel(ORDERS["table_id"], "customer_id", CUSTOMERS["table_id"]),
+    ]
+    _detect(service, [ORDERS, PRODUCTS, CUSTOMERS])
+
+    assert _detect(service, [ORDERS, PRODUCTS]) == [(ORDERS["table_id"], PRODUCTS["table_id"])]
+    assert len(service._runner.prompts) == 1
+
+
+def test_superset_sends_only_the_new_table(service):
+    service._runner.reply = [_rel(ORDERS["table_id"], "product_id", PRODUCTS["table_id"])]
+    _detect(service, [ORDERS, PRODUCTS])
+
+    service._runner.reply = [_rel(ITEMS["table_id"], "order_id", ORDERS["table_id"])]
+    assert _detect(service, [ORDERS, PRODUCTS, ITEMS]) == [
+        (ITEMS["table_id"], ORDERS["table_id"]),
+        (ORDERS["table_id"], PRODUCTS["table_id"]),
+    ]
+    assert _new_tables(service._runner.prompts[-1]) == 1
+
+
+def test_tables_seen_separately_are_analyzed_together(service):
+    service._runner.reply = [_rel(ORDERS["table_id"], "product_id", PRODUCTS["table_id"])]
+    _detect(service, [ORDERS, PRODUCTS])
+    service._runner.reply = []
+    _detect(service, [PRODUCTS, CUSTOMERS])
+
+    # orders and customers were never in the same model
+    service._runner.reply = [_rel(ORDERS["table_id"], "customer_id", CUSTOMERS["table_id"])]
+    assert _detect(service, [ORDERS, CUSTOMERS]) == [(ORDERS["table_id"], CUSTOMERS["table_id"])]
+    assert len(service._runner.prompts) == 3
+
+    # Every pair has now been analyzed
+    assert len(_detect(service, [ORDERS, PRODUCTS, CUSTOMERS])) == 2
+    assert len(service._runner.prompts) == 3